@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database.database import create_engine_from_settings, serialized_writes
+from database.models import Base, User, Seller, Product, Order, SellerStatus
+from database.cart import upsert_cart_item
+from database.checkout import checkout_cart
+from database.search import install_search
+
+
+async def seed(engine, users: int, products: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(install_search)
+        await conn.execute(insert(User), [{"id": i, "telegram_id": 100000 + i} for i in range(1, users + 2)])
+        await conn.execute(insert(Seller), [{"id": 1, "user_id": users + 1, "company_name": "Продавец", "status": SellerStatus.APPROVED}])
+        await conn.execute(insert(Product), [
+            {"id": i, "seller_id": 1, "name": f"Товар {i}", "price": round(random.uniform(100, 5000), 2)}
+            for i in range(1, products + 1)
+        ])
+
+
+async def checkout_once(session_maker, telegram_id: int, key: str):
+    async with session_maker() as session:
+        async with serialized_writes(session):
+            result = await checkout_cart(session, telegram_id, key)
+            await session.commit()
+    return result
+
+
+async def shopper(session_maker, telegram_id: int, deadline: float, items: int, products: int, double_tap: float, stats: dict):
+    while time.perf_counter() < deadline:
+        async with session_maker() as session:
+            async with serialized_writes(session):
+                for product_id in random.sample(range(1, products + 1), items):
+                    await upsert_cart_item(session, telegram_id, product_id, random.randint(1, 3))
+                await session.commit()
+
+        key = uuid.uuid4().hex
+        started_at = time.perf_counter()
+        try:
+            if random.random() < double_tap:
+                # Двойное нажатие: два одинаковых запроса одновременно
+                results = await asyncio.gather(
+                    checkout_once(session_maker, telegram_id, key),
+                    checkout_once(session_maker, telegram_id, key),
+                )
+                stats["double_taps"] += 1
+                stats["duplicates_blocked"] += sum(not result.created for result in results)
+                if len({result.order_id for result in results}) != 1:
+                    stats["duplicate_orders"] += 1
+            else:
+                await checkout_once(session_maker, telegram_id, key)
+        except Exception as e:
+            stats["errors"] += 1
+            stats["last_error"] = repr(e)[:200]
+            continue
+        stats["latencies"].append((time.perf_counter() - started_at) * 1000)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Checkout throughput under concurrent shoppers")
+    parser.add_argument("--url", help="database URL, e.g. postgresql+asyncpg://... (default: temporary SQLite in WAL mode)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--double-tap", type=float, default=0.1, help="share of checkouts sent twice with the same key")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = args.url or f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        engine = create_engine_from_settings(url, "production")
+        await seed(engine, args.users, args.products)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+        stats = {"latencies": [], "errors": 0, "double_taps": 0, "duplicates_blocked": 0, "duplicate_orders": 0}
+        started_at = time.perf_counter()
+        deadline = started_at + args.seconds
+        await asyncio.gather(*[
+            shopper(session_maker, 100000 + i, deadline, args.items, args.products, args.double_tap, stats)
+            for i in range(1, args.users + 1)
+        ])
+        elapsed = time.perf_counter() - started_at
+
+        async with session_maker() as session:
+            orders = await session.scalar(select(func.count()).select_from(Order))
+        await engine.dispose()
+
+    latencies = stats["latencies"]
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    print(f"backend      {engine.dialect.name}, {args.users} concurrent shoppers")
+    print(f"checkouts    {len(latencies)} in {elapsed:.1f} s = {len(latencies) / elapsed:.1f}/s (orders in DB: {orders})")
+    print(f"latency      p50 {quantiles[49]:.1f} ms  p95 {quantiles[94]:.1f} ms  p99 {quantiles[98]:.1f} ms")
+    print(f"double taps  {stats['double_taps']}, duplicates blocked {stats['duplicates_blocked']}, duplicate orders {stats['duplicate_orders']}")
+    print(f"errors       {stats['errors']}" + (f" (last: {stats['last_error']})" if stats["errors"] else ""))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import resource
+import statistics
+from typing import Dict, List
+
+# Объёмы синтетических данных по умолчанию (benchmarks.seed, benchmarks.suite)
+DEFAULT_VOLUMES = {
+    "users": 100_000,
+    "sellers": 1_000,
+    "products": 1_000_000,
+    "orders": 200_000,
+    "cart_items": 100_000,
+    "favorites": 100_000,
+}
+# Первый telegram_id синтетических пользователей; новые пользователи сценариев берутся выше
+TELEGRAM_ID_BASE = 1_000_000
+
+
+def current_rss_mb() -> float:
+    # Учитываем только анонимную память: страницы файла БД, отображённые через mmap, растут вместе с чтением
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Без /proc доступен только пик за всё время процесса
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler:
+    # Пик памяти за время сценария: опрос раз в interval секунд в фоне
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._task = None
+
+    async def _sample(self) -> None:
+        while True:
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self) -> "RssSampler":
+        self.peak_mb = current_rss_mb()
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._task.cancel()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    if len(latencies_ms) < 2:
+        value = latencies_ms[0] if latencies_ms else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    quantiles = statistics.quantiles(latencies_ms, n=100)
+    return {
+        "p50_ms": round(quantiles[49], 3),
+        "p95_ms": round(quantiles[94], 3),
+        "p99_ms": round(quantiles[98], 3),
+    }
+
+
+def add_volume_arguments(parser: argparse.ArgumentParser) -> None:
+    for name, default in DEFAULT_VOLUMES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default, dest=name)
+    parser.add_argument("--seed", type=int, default=1, help="random seed: the same seed gives the same data")
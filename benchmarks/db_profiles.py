@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database.models import Base, User, Seller, Product, SellerStatus
+from database.catalog import build_catalog_query, build_catalog_page
+from database.database import ENGINE_PROFILES, create_engine_from_settings
+
+
+async def seed(engine, products: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{"id": i, "telegram_id": i} for i in range(1, 101)])
+        await conn.execute(insert(Seller), [
+            {"id": i, "user_id": i, "company_name": f"Продавец {i}", "status": SellerStatus.APPROVED}
+            for i in range(1, 101)
+        ])
+
+        started_at = datetime(2024, 1, 1)
+        batch = []
+        for i in range(1, products + 1):
+            batch.append({
+                "id": i,
+                "seller_id": random.randint(1, 100),
+                "name": f"Товар {i}",
+                "description": "Описание товара " * 5,
+                "price": round(random.uniform(100, 50000), 2),
+                "is_available": True,
+                "created_at": started_at + timedelta(seconds=i),
+            })
+            if len(batch) == 5000:
+                await conn.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(Product), batch)
+
+
+async def catalog_worker(session_maker, deadline: float, pages: int) -> int:
+    done = 0
+    while time.perf_counter() < deadline:
+        cursor = None
+        async with session_maker() as session:
+            # Первая страница и несколько следующих по курсору, как при прокрутке каталога
+            for _ in range(pages):
+                result = await session.execute(build_catalog_query(cursor=cursor))
+                page = build_catalog_page(result.all(), 20)
+                done += 1
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+    return done
+
+
+async def run_profile(profile: str, products: int, seconds: float, concurrency: int, pages: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        # echo в профиле dev пишет в stdout: замеряем его стоимость, но не засоряем вывод
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            engine = create_engine_from_settings(url, profile)
+            await seed(engine, products)
+            session_maker = async_sessionmaker(engine, expire_on_commit=False)
+            deadline = time.perf_counter() + seconds
+            started_at = time.perf_counter()
+            counts = await asyncio.gather(*[catalog_worker(session_maker, deadline, pages) for _ in range(concurrency)])
+            elapsed = time.perf_counter() - started_at
+            await engine.dispose()
+    return sum(counts) / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Catalog query throughput for each engine profile")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--profile", action="append", choices=sorted(ENGINE_PROFILES))
+    args = parser.parse_args()
+
+    for profile in args.profile or list(ENGINE_PROFILES):
+        qps = await run_profile(profile, args.products, args.seconds, args.concurrency, args.pages)
+        print(f"{profile:<12} {qps:10.1f} catalog queries/sec")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
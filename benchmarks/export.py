@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database.database import create_engine_from_settings
+from database.models import Product
+from database.export import EXPORT_COLUMNS, build_export_query, iter_csv, iter_ndjson
+from benchmarks.common import current_rss_mb
+from benchmarks.db_profiles import seed
+
+
+async def export_as_list(available_only: bool, batch_size: int, session_maker):
+    # Прежний подход: весь каталог читается в список и сериализуется целиком
+    async with session_maker() as session:
+        result = await session.execute(build_export_query(available_only))
+        rows = [dict(zip(EXPORT_COLUMNS, row)) for row in result.all()]
+    yield json.dumps(rows, ensure_ascii=False, default=str).encode()
+
+
+EXPORTERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+    "list": export_as_list,
+}
+
+
+async def run_export(mode: str, session_maker, batch_size: int) -> dict:
+    peak_rss = baseline_rss = current_rss_mb()
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, current_rss_mb())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample_rss())
+    written = 0
+    started_at = time.perf_counter()
+    async for chunk in EXPORTERS[mode](False, batch_size, session_maker=session_maker):
+        written += len(chunk)
+        peak_rss = max(peak_rss, current_rss_mb())
+    elapsed = time.perf_counter() - started_at
+    sampler.cancel()
+
+    return {
+        "elapsed": elapsed,
+        "bytes": written,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": peak_rss,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Catalog export throughput and memory usage")
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--mode", action="append", choices=sorted(EXPORTERS))
+    parser.add_argument("--db", help="reuse an existing database file instead of seeding a temporary one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.db or os.path.join(tmp_dir, "bench.db")
+        engine = create_engine_from_settings(f"sqlite+aiosqlite:///{path}", "production")
+        if not args.db:
+            print(f"Seeding {args.products} products...")
+            await seed(engine, args.products)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_maker() as session:
+            products = await session.scalar(select(func.count()).select_from(Product))
+
+        # Каждый режим лучше запускать отдельным процессом: память, освобождённая Python, не всегда возвращается ОС
+        for mode in args.mode or ["ndjson", "csv"]:
+            stats = await run_export(mode, session_maker, args.batch_size)
+            rows_per_sec = products / stats["elapsed"]
+            print(
+                f"{mode:<8} {stats['elapsed']:8.2f} s {rows_per_sec:12.0f} rows/sec "
+                f"{stats['bytes'] / 2**20:10.1f} MB "
+                f"rss {stats['baseline_rss_mb']:.1f} -> {stats['peak_rss_mb']:.1f} MB"
+            )
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict, deque
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.notifications import NotificationDispatcher
+from database.database import create_engine_from_settings
+from database.models import Base, NotificationOutbox
+
+
+class FakeBotAPI:
+    # Локальный Bot API: отвечает на sendMessage с задержкой и, как Telegram, возвращает 429
+    # при превышении общего лимита за секунду или частых сообщениях в один чат
+    def __init__(self, global_limit: int, chat_interval: float, latency: float):
+        self.global_limit = global_limit
+        self.chat_interval = chat_interval
+        self.latency = latency
+        self.recent = deque()
+        self.last_by_chat = {}
+        self.delivered = []
+        self.per_chat = defaultdict(list)
+        self.rejected = 0
+        self.message_id = 0
+
+    def _flood(self, chat_id: int, now: float) -> bool:
+        while self.recent and self.recent[0] <= now - 1:
+            self.recent.popleft()
+        if len(self.recent) >= self.global_limit:
+            return True
+        # Небольшой допуск: сеть сдвигает моменты прихода запросов
+        last = self.last_by_chat.get(chat_id)
+        return last is not None and now - last < self.chat_interval * 0.9
+
+    async def handle(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        await asyncio.sleep(self.latency)
+
+        now = time.monotonic()
+        if self._flood(chat_id, now):
+            self.rejected += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+
+        self.recent.append(now)
+        self.last_by_chat[chat_id] = now
+        self.delivered.append(now)
+        self.per_chat[chat_id].append(now)
+        self.message_id += 1
+        return web.json_response({"ok": True, "result": {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": data["text"],
+        }})
+
+    def max_per_second(self) -> int:
+        # Наибольшее число доставленных сообщений в любом окне длиной 1 с
+        best, start = 0, 0
+        for end, moment in enumerate(self.delivered):
+            while self.delivered[start] <= moment - 1:
+                start += 1
+            best = max(best, end - start + 1)
+        return best
+
+    def min_chat_interval(self) -> float:
+        intervals = [
+            later - earlier
+            for moments in self.per_chat.values()
+            for earlier, later in zip(moments, moments[1:])
+        ]
+        return min(intervals, default=float("nan"))
+
+
+async def start_server(api: FakeBotAPI) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_post("/bot{token}/sendMessage", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8765).start()
+    return runner
+
+
+async def run_naive(bot: Bot, messages) -> None:
+    # Для сравнения: всё сразу, без лимитов и повторов
+    async def send(chat_id: int, text: str):
+        try:
+            await bot.send_message(chat_id, text)
+        except Exception:
+            pass
+
+    await asyncio.gather(*[send(chat_id, text) for chat_id, text in messages])
+
+
+async def run_dispatcher(bot: Bot, session_maker, messages, args) -> None:
+    async with session_maker() as session:
+        await session.execute(insert(NotificationOutbox), [{"chat_id": chat_id, "text": text} for chat_id, text in messages])
+        await session.commit()
+
+    dispatcher = NotificationDispatcher(
+        bot,
+        rate=args.rate,
+        chat_rate=args.chat_rate,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        poll_interval=0.2,
+        session_maker=session_maker,
+    )
+    task = asyncio.create_task(dispatcher.run())
+    while True:
+        await asyncio.sleep(0.2)
+        async with session_maker() as session:
+            remaining = await session.scalar(
+                select(func.count()).select_from(NotificationOutbox).where(NotificationOutbox.failed == False)
+            )
+        if remaining == 0:
+            break
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    print(f"dispatcher   {dispatcher.stats()}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Notification dispatcher against a local fake Bot API")
+    parser.add_argument("--mode", choices=["dispatcher", "naive"], default="dispatcher")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--chats", type=int, default=400, help="fewer chats than messages means repeated recipients")
+    parser.add_argument("--rate", type=float, default=25)
+    parser.add_argument("--chat-rate", type=float, default=1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.03, help="fake API response time, s")
+    parser.add_argument("--global-limit", type=int, default=30)
+    args = parser.parse_args()
+
+    random.seed(1)
+    messages = [(random.randint(1, args.chats), f"Сообщение {i}") for i in range(args.messages)]
+    api = FakeBotAPI(args.global_limit, 1 / args.chat_rate if args.chat_rate else 1, args.latency)
+    runner = await start_server(api)
+    bot = Bot("123456:fake", session=AiohttpSession(api=TelegramAPIServer.from_base("http://127.0.0.1:8765")))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine_from_settings(f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}", "production")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+        started_at = time.perf_counter()
+        if args.mode == "naive":
+            await run_naive(bot, messages)
+        else:
+            await run_dispatcher(bot, session_maker, messages, args)
+        elapsed = time.perf_counter() - started_at
+        await engine.dispose()
+
+    await bot.session.close()
+    await runner.cleanup()
+
+    delivered = len(api.delivered)
+    print(f"mode         {args.mode}, {args.messages} messages to {len(set(chat for chat, _ in messages))} chats")
+    print(f"delivered    {delivered} in {elapsed:.1f} s = {delivered / elapsed:.1f} msg/s")
+    print(f"429 answers  {api.rejected}")
+    print(f"peak rate    {api.max_per_second()} msg in any 1 s (limit {args.global_limit})")
+    print(f"chat spacing min {api.min_chat_interval():.2f} s between messages to one chat")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
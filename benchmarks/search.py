@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import insert, or_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database.database import create_engine_from_settings
+from database.models import Base, User, Seller, Product, SellerStatus
+from database.search import build_search_query, install_search, parse_search_terms
+
+ADJECTIVES = [
+    "новый", "красный", "синий", "чёрный", "белый", "мягкий", "кожаный", "деревянный", "детский", "зимний",
+    "летний", "спортивный", "умный", "беспроводной", "компактный", "большой", "тёплый", "лёгкий", "прочный", "яркий",
+]
+NOUNS = [
+    "телефон", "чехол", "наушники", "рюкзак", "куртка", "ботинки", "чайник", "лампа", "стол", "стул",
+    "ноутбук", "планшет", "часы", "кружка", "игрушка", "книга", "платье", "шарф", "сумка", "коврик",
+    "кабель", "зарядка", "колонка", "мышь", "клавиатура", "монитор", "пылесос", "утюг", "фен", "ёлка",
+]
+BRANDS = ["samsung", "xiaomi", "apple", "lenovo", "philips", "bosch", "adidas", "nike", "ikea", "tefal"]
+FILLER = [
+    "качество", "гарантия", "доставка", "подарок", "оригинал", "скидка", "размер", "цвет", "материал", "комплект",
+    "удобный", "надёжный", "модель", "серия", "хит", "новинка", "стильный", "практичный", "популярный", "выбор",
+]
+
+
+async def seed(engine, products: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(install_search)
+        await conn.execute(insert(User), [{"id": i, "telegram_id": i} for i in range(1, 201)])
+        await conn.execute(insert(Seller), [
+            {"id": i, "user_id": i, "company_name": f"Магазин {random.choice(NOUNS)} {i}", "status": SellerStatus.APPROVED}
+            for i in range(1, 201)
+        ])
+
+        batch = []
+        for i in range(1, products + 1):
+            name = f"{random.choice(ADJECTIVES)} {random.choice(NOUNS)} {random.choice(BRANDS)} {random.randint(1, 9999)}"
+            batch.append({
+                "id": i,
+                "seller_id": random.randint(1, 200),
+                "name": name.capitalize(),
+                "description": " ".join(random.choices(FILLER + NOUNS, k=12)),
+                "price": round(random.uniform(100, 50000), 2),
+                "is_available": True,
+            })
+            if len(batch) == 5000:
+                await conn.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(Product), batch)
+
+
+def random_query() -> str:
+    # Как вводят пользователи: слово целиком или его начало, иногда с брендом или прилагательным
+    noun = random.choice(NOUNS)
+    query = noun[:random.randint(3, len(noun))]
+    if random.random() < 0.5:
+        query = f"{random.choice(ADJECTIVES)} {query}"
+    if random.random() < 0.3:
+        query = f"{query} {random.choice(BRANDS)[:4]}"
+    return query
+
+
+def build_like_query(terms, limit: int = 20):
+    # То, что пришлось бы делать без индекса: сканирование LIKE по всем товарам
+    query = select(Product, Seller).join(Seller, Product.seller_id == Seller.id).where(Product.is_available == True)
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.where(or_(Product.name.ilike(pattern), Product.description.ilike(pattern), Seller.company_name.ilike(pattern)))
+    return query.order_by(Product.id).limit(limit + 1)
+
+
+async def measure(session_maker, dialect_name: str, queries, method: str) -> list:
+    timings = []
+    async with session_maker() as session:
+        for query in queries:
+            terms = parse_search_terms(query)
+            if method == "fts":
+                statement = build_search_query(dialect_name, terms)
+            else:
+                statement = build_like_query(terms)
+            started_at = time.perf_counter()
+            (await session.execute(statement)).all()
+            timings.append((time.perf_counter() - started_at) * 1000)
+    return timings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Search latency: FTS index vs LIKE scan")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--method", action="append", choices=["fts", "like"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine_from_settings(f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}", "production")
+        await seed(engine, args.products)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+        queries = [random_query() for _ in range(args.queries)]
+        for method in args.method or ["fts", "like"]:
+            timings = await measure(session_maker, engine.dialect.name, queries, method)
+            quantiles = statistics.quantiles(timings, n=100)
+            print(f"{method:<6} p50 {quantiles[49]:8.2f} ms  p95 {quantiles[94]:8.2f} ms  max {max(timings):8.2f} ms")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+from sqlalchemy import insert
+from database.database import create_engine_from_settings
+from database.models import (
+    Base,
+    CartItem,
+    Favorite,
+    Order,
+    OrderItem,
+    OrderStatus,
+    Product,
+    Seller,
+    SellerStatus,
+    User,
+    UserRole,
+)
+from database.migrations import migrate
+from benchmarks.common import DEFAULT_VOLUMES, TELEGRAM_ID_BASE, add_volume_arguments
+
+SEED_BATCH_SIZE = 5000
+STARTED_AT = datetime(2024, 1, 1)
+
+WORDS = (
+    "смартфон ноутбук наушники чехол кабель зарядка часы браслет колонка планшет "
+    "куртка платье кроссовки рюкзак сумка шапка перчатки футболка джинсы свитер "
+    "чайник кофемолка блендер утюг пылесос лампа подушка одеяло полотенце кружка"
+).split()
+ADJECTIVES = "новый красный чёрный белый беспроводной кожаный тёплый лёгкий большой детский".split()
+
+
+def chunks(rows: Iterator[Dict], size: int = SEED_BATCH_SIZE) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_users(rng: random.Random, count: int, sellers: int) -> Iterator[Dict]:
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "telegram_id": TELEGRAM_ID_BASE + i,
+            "username": f"user{i}",
+            "first_name": f"Пользователь {i}",
+            "role": UserRole.SELLER if i <= sellers else UserRole.USER,
+            "created_at": STARTED_AT + timedelta(seconds=rng.randint(0, 86400 * 365)),
+        }
+
+
+def generate_sellers(rng: random.Random, count: int) -> Iterator[Dict]:
+    # Продавцы — первые count пользователей; каждый десятый ещё на модерации
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "user_id": i,
+            "company_name": f"{rng.choice(ADJECTIVES).capitalize()} {rng.choice(WORDS)} {i}",
+            "description": "Магазин " + " ".join(rng.choices(WORDS, k=8)),
+            "status": SellerStatus.PENDING if i % 10 == 0 else SellerStatus.APPROVED,
+            "created_at": STARTED_AT + timedelta(minutes=i),
+        }
+
+
+def generate_products(rng: random.Random, count: int, sellers: int) -> Iterator[Dict]:
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "seller_id": rng.randint(1, sellers),
+            "name": f"{rng.choice(ADJECTIVES).capitalize()} {rng.choice(WORDS)} {i}",
+            "description": " ".join(rng.choices(WORDS + ADJECTIVES, k=12)),
+            "price": round(rng.uniform(100, 50000), 2),
+            "is_available": rng.random() < 0.9,
+            "created_at": STARTED_AT + timedelta(seconds=i * 10),
+        }
+
+
+def generate_orders(rng: random.Random, count: int, users: int, products: int):
+    # Заказы и их позиции генерируются вместе, чтобы сумма заказа совпадала с позициями
+    statuses = (OrderStatus.PENDING, OrderStatus.CONFIRMED, OrderStatus.DELIVERED, OrderStatus.CANCELLED)
+    item_id = 0
+    for order_id in range(1, count + 1):
+        items = []
+        for product_id in rng.sample(range(1, products + 1), rng.randint(1, 5)):
+            item_id += 1
+            items.append({
+                "id": item_id,
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": rng.randint(1, 3),
+                "price_at_order": round(rng.uniform(100, 50000), 2),
+            })
+        status = rng.choices(statuses, weights=(2, 3, 4, 1))[0]
+        created_at = STARTED_AT + timedelta(seconds=rng.randint(0, 86400 * 365))
+        order = {
+            "id": order_id,
+            "user_id": rng.randint(1, users),
+            "total_amount": round(sum(item["quantity"] * item["price_at_order"] for item in items), 2),
+            "status": status,
+            "created_at": created_at,
+            "confirmed_at": created_at + timedelta(hours=1) if status in (OrderStatus.CONFIRMED, OrderStatus.DELIVERED) else None,
+        }
+        yield order, items
+
+
+def generate_pairs(rng: random.Random, count: int, users: int, products: int) -> Iterator[tuple]:
+    # Уникальные пары (пользователь, товар) для корзин и избранного; как и webapp, храним telegram_id
+    seen = set()
+    while len(seen) < count:
+        pair = (TELEGRAM_ID_BASE + rng.randint(1, users), rng.randint(1, products))
+        if pair not in seen:
+            seen.add(pair)
+            yield pair
+
+
+async def seed_database(engine, volumes: Dict[str, int], seed: int = 1, log=print) -> None:
+    rng = random.Random(seed)
+    volumes = {**DEFAULT_VOLUMES, **volumes}
+    users, products = volumes["users"], volumes["products"]
+
+    async def insert_all(model, rows: Iterator[Dict]) -> None:
+        started_at = time.perf_counter()
+        total = 0
+        async with engine.begin() as conn:
+            for batch in chunks(rows):
+                await conn.execute(insert(model), batch)
+                total += len(batch)
+        log(f"seeded {model.__tablename__:<12} {total:>9} rows in {time.perf_counter() - started_at:.1f} s")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    await insert_all(User, generate_users(rng, users, volumes["sellers"]))
+    await insert_all(Seller, generate_sellers(rng, volumes["sellers"]))
+    await insert_all(Product, generate_products(rng, products, volumes["sellers"]))
+
+    orders, order_items = [], []
+    async with engine.begin() as conn:
+        for order, items in generate_orders(rng, volumes["orders"], users, products):
+            orders.append(order)
+            order_items.extend(items)
+            if len(orders) >= SEED_BATCH_SIZE:
+                await conn.execute(insert(Order), orders)
+                await conn.execute(insert(OrderItem), order_items)
+                orders, order_items = [], []
+        if orders:
+            await conn.execute(insert(Order), orders)
+            await conn.execute(insert(OrderItem), order_items)
+    log(f"seeded {'orders':<12} {volumes['orders']:>9} rows")
+
+    await insert_all(CartItem, (
+        {"user_id": user_id, "product_id": product_id, "quantity": rng.randint(1, 3)}
+        for user_id, product_id in generate_pairs(rng, volumes["cart_items"], users, products)
+    ))
+    await insert_all(Favorite, (
+        {"user_id": user_id, "product_id": product_id}
+        for user_id, product_id in generate_pairs(rng, volumes["favorites"], users, products)
+    ))
+
+    # Поисковый индекс строится один раз по готовому каталогу, а не триггерами на каждую строку;
+    # миграции заодно отмечают версию схемы, и приложение стартует на этой базе без изменений
+    started_at = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(migrate)
+    log(f"built search index in {time.perf_counter() - started_at:.1f} s")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic marketplace data")
+    parser.add_argument("db", help="SQLite file to create, or a database URL")
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    url = args.db if "://" in args.db else f"sqlite+aiosqlite:///{args.db}"
+    engine = create_engine_from_settings(url, "production")
+    await seed_database(engine, {name: getattr(args, name) for name in DEFAULT_VOLUMES}, args.seed)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Холодный старт до первого обработанного обновления: каждый запуск — новый интерпретатор.
+# Отметки времени считаются от момента перед запуском процесса (time.monotonic общий для процессов)
+PHASES = ("interpreter", "import_webapp", "import_bot", "init_db", "bot_ready", "first_update")
+
+
+async def boot(init: str, mark) -> None:
+    from benchmarks.suite import create_fake_bot, start_update
+    from bot.main import create_dispatcher
+    from database import dispose_engines, engine, init_db
+
+    if init == "legacy":
+        # Как до миграций: create_all, сверка всех таблиц и поисковый индекс на каждом запуске
+        from database.migrations import reconcile_legacy_schema
+        from database.models import Base
+        from database.search import install_search
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(reconcile_legacy_schema)
+            await conn.run_sync(install_search)
+    else:
+        await init_db()
+    mark("init_db")
+
+    dispatcher = create_dispatcher()
+    bot = create_fake_bot()
+    mark("bot_ready")
+
+    await dispatcher.feed_update(bot, start_update(1, 1000))
+    mark("first_update")
+
+    await dispatcher.storage.close()
+    await dispose_engines()
+
+
+def child(started_at: float, init: str) -> None:
+    marks = {}
+
+    def mark(name: str) -> None:
+        marks[name] = round((time.monotonic() - started_at) * 1000, 1)
+
+    mark("interpreter")
+    # Как run.py в режиме single: WebApp и бот в одном процессе
+    import webapp.app  # noqa: F401
+    mark("import_webapp")
+    import bot.main  # noqa: F401
+    mark("import_bot")
+    asyncio.run(boot(init, mark))
+    print(json.dumps(marks))
+
+
+def run_once(db_path: str, init: str) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "BOT_TOKEN": os.environ.get("BOT_TOKEN", "123456:bench"),
+        "WEBAPP_URL": os.environ.get("WEBAPP_URL", "http://localhost"),
+        "NOTIFY_RATE": "0",
+    }
+    started_at = time.monotonic()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", str(started_at), "--init", init],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold start to the first handled update")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--init", choices=["migrations", "legacy"], default="migrations")
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child, args.init)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for init in ("legacy", "migrations"):
+            for state in ("new database", "existing database"):
+                db_path = os.path.join(tmp_dir, f"{init}.db")
+                runs = []
+                for _ in range(args.runs):
+                    if state == "new database":
+                        for suffix in ("", "-wal", "-shm"):
+                            if os.path.exists(db_path + suffix):
+                                os.remove(db_path + suffix)
+                    runs.append(run_once(db_path, init))
+                medians = {phase: statistics.median(run[phase] for run in runs) for phase in PHASES}
+                steps = ", ".join(f"{phase} {medians[phase]:.0f}" for phase in PHASES)
+                init_ms = medians["init_db"] - medians["import_bot"]
+                print(f"{init:<10} {state:<17} init_db {init_ms:6.1f} ms, first update at {medians['first_update']:6.0f} ms  ({steps})")
+
+
+if __name__ == "__main__":
+    main()
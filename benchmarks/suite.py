@@ -0,0 +1,332 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+from benchmarks.common import DEFAULT_VOLUMES, TELEGRAM_ID_BASE, RssSampler, add_volume_arguments, latency_summary
+
+# Нагрузочный прогон магазина целиком в одном процессе: WebApp через ASGITransport, бот через
+# Dispatcher.feed_update с фейковой сессией Bot API. Приложение импортируется только после того,
+# как DATABASE_URL указывает на копию синтетической базы: настройки читаются при импорте
+
+SCENARIOS = ("catalog_browse", "cart_churn", "start_storm")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Метрики, по которым сравниваются прогоны; True — больше значит лучше
+COMPARED_METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+
+def git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": None}
+    return {"commit": commit, "dirty": bool(status.strip())}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.errors = 0
+
+    async def measure(self, call: Awaitable, ok: Callable[[Any], bool] = lambda result: True) -> Any:
+        started_at = time.perf_counter()
+        try:
+            result = await call
+        except Exception:
+            self.errors += 1
+            self.latencies_ms.append((time.perf_counter() - started_at) * 1000)
+            return None
+        self.latencies_ms.append((time.perf_counter() - started_at) * 1000)
+        if not ok(result):
+            self.errors += 1
+        return result
+
+
+async def run_scenario(operations: List[Callable[[Recorder], Awaitable[None]]], concurrency: int) -> Dict[str, Any]:
+    # Набор операций сгенерирован заранее из seed — одинаковый от прогона к прогону
+    recorder = Recorder()
+    pending = iter(operations)
+
+    async def worker():
+        for operation in pending:
+            await operation(recorder)
+
+    async with RssSampler() as rss:
+        started_at = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started_at
+
+    return {
+        "operations": len(operations),
+        "requests": len(recorder.latencies_ms),
+        "errors": recorder.errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(recorder.latencies_ms) / elapsed, 1),
+        **latency_summary(recorder.latencies_ms),
+        "peak_rss_mb": round(rss.peak_mb, 1),
+    }
+
+
+def http_ok(response) -> bool:
+    return response.status_code < 400
+
+
+def catalog_browse(client, rng: random.Random, args) -> List[Callable]:
+    # Покупатель листает каталог на несколько страниц вперёд, иногда с фильтром по продавцу или цене
+    def browse(params: Dict[str, Any], pages: int):
+        async def operation(recorder: Recorder) -> None:
+            query = dict(params)
+            for _ in range(pages):
+                response = await recorder.measure(client.get("/catalog", params=query), http_ok)
+                if response is None or response.status_code != 200:
+                    return
+                next_cursor = response.json().get("next_cursor")
+                if not next_cursor:
+                    return
+                query["cursor"] = next_cursor
+        return operation
+
+    operations = []
+    for _ in range(args.operations):
+        params: Dict[str, Any] = {}
+        kind = rng.random()
+        if kind < 0.2:
+            params["seller_id"] = rng.randint(1, args.sellers)
+        elif kind < 0.4:
+            low = rng.randint(100, 40000)
+            params.update(min_price=low, max_price=low + rng.randint(500, 10000))
+        operations.append(browse(params, rng.randint(1, 5)))
+    return operations
+
+
+def cart_churn(client, rng: random.Random, args) -> List[Callable]:
+    # Пачка изменений корзины через /batch и перечитывание корзины, как в WebApp после каждого действия
+    def churn(telegram_id: int, batch: List[Dict[str, Any]]):
+        async def operation(recorder: Recorder) -> None:
+            await recorder.measure(client.post("/batch", json={"user_id": telegram_id, "operations": batch}), http_ok)
+            await recorder.measure(client.get(f"/cart/{telegram_id}"), http_ok)
+        return operation
+
+    ops = ("cart_add", "cart_add", "cart_remove", "favorite_add")
+    operations = []
+    for _ in range(args.operations):
+        batch = []
+        for _ in range(rng.randint(1, 4)):
+            op = rng.choice(ops)
+            batch.append({"op": op, "product_id": rng.randint(1, args.products), "quantity": rng.randint(1, 3)})
+        if rng.random() < 0.05:
+            batch.append({"op": "cart_clear"})
+        operations.append(churn(TELEGRAM_ID_BASE + rng.randint(1, args.users), batch))
+    return operations
+
+
+def start_update(update_id: int, telegram_id: int):
+    from aiogram.types import Chat, Message, Update, User as TelegramUser
+
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id,
+        date=datetime.now(),
+        chat=Chat(id=telegram_id, type="private"),
+        from_user=TelegramUser(id=telegram_id, is_bot=False, first_name=f"Гость {telegram_id}"),
+        text="/start",
+    ))
+
+
+def start_storm(dispatcher, bot, rng: random.Random, args) -> List[Callable]:
+    # Наплыв /start после рекламы: половина — новые пользователи, половина — вернувшиеся
+    from aiogram.dispatcher.event.bases import UNHANDLED
+
+    new_ids = iter(range(TELEGRAM_ID_BASE + args.users + 1, TELEGRAM_ID_BASE + args.users + args.operations + 1))
+
+    def start(update_id: int, telegram_id: int):
+        async def operation(recorder: Recorder) -> None:
+            update = start_update(update_id, telegram_id)
+            await recorder.measure(dispatcher.feed_update(bot, update), lambda result: result is not UNHANDLED)
+        return operation
+
+    operations = []
+    for update_id in range(1, args.operations + 1):
+        telegram_id = next(new_ids) if rng.random() < 0.5 else TELEGRAM_ID_BASE + rng.randint(1, args.users)
+        operations.append(start(update_id, telegram_id))
+    return operations
+
+
+def create_fake_bot():
+    # Bot API не вызывается по сети: ответ собирается на месте, считается только работа бота
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import SendMessage
+    from aiogram.types import Chat, Message
+
+    class FakeSession(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.requests = 0
+
+        async def make_request(self, bot, method, timeout=None):
+            self.requests += 1
+            if isinstance(method, SendMessage):
+                return Message(
+                    message_id=self.requests,
+                    date=datetime.now(),
+                    chat=Chat(id=method.chat_id, type="private"),
+                    text=method.text,
+                )
+            return True
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b""
+
+        async def close(self) -> None:
+            pass
+
+    return Bot("123456:bench", session=FakeSession())
+
+
+def database_paths(args) -> tuple:
+    volumes = "-".join(str(getattr(args, name)) for name in DEFAULT_VOLUMES)
+    pristine = os.path.join(args.data_dir, f"marketplace-{volumes}-seed{args.seed}.db")
+    return pristine, os.path.join(args.data_dir, "marketplace-bench-run.db")
+
+
+async def prepare_database(args, pristine: str, working: str) -> None:
+    # Засев миллиона товаров дорог: чистая база засевается один раз и копируется перед каждым прогоном
+    from benchmarks.seed import seed_database
+    from database.database import create_engine_from_settings
+
+    if not os.path.exists(pristine):
+        print(f"seeding {pristine}")
+        partial = pristine + ".partial"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(partial + suffix):
+                os.remove(partial + suffix)
+        engine = create_engine_from_settings(f"sqlite+aiosqlite:///{partial}", "production")
+        await seed_database(engine, {name: getattr(args, name) for name in DEFAULT_VOLUMES}, args.seed)
+        await engine.dispose()
+        os.replace(partial, pristine)
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(working + suffix):
+            os.remove(working + suffix)
+    shutil.copyfile(pristine, working)
+
+
+async def run_suite(args, pristine: str, working: str) -> Dict[str, Any]:
+    import httpx
+    from bot.main import create_dispatcher
+    from database import dispose_engines, init_db
+    from webapp.app import app
+
+    await prepare_database(args, pristine, working)
+    await init_db()
+    dispatcher = create_dispatcher()
+    bot = create_fake_bot()
+    transport = httpx.ASGITransport(app=app)
+
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in args.scenarios:
+            # У каждого сценария свой генератор: состав нагрузки не зависит от набора сценариев
+            rng = random.Random(f"{args.seed}:{name}")
+            if name == "start_storm":
+                operations = start_storm(dispatcher, bot, rng, args)
+            else:
+                operations = globals()[name](client, rng, args)
+            results[name] = await run_scenario(operations, args.concurrency)
+            print(f"{name:<15} {format_result(results[name])}")
+
+    await dispatcher.storage.close()
+    await bot.session.close()
+    await dispose_engines()
+    return results
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    return (
+        f"{result['requests']:>6} req in {result['seconds']:>6.1f} s = {result['throughput']:>7.1f} req/s, "
+        f"p50 {result['p50_ms']:.1f} / p95 {result['p95_ms']:.1f} / p99 {result['p99_ms']:.1f} ms, "
+        f"errors {result['errors']}, peak RSS {result['peak_rss_mb']:.0f} MB"
+    )
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    print(f"\ncompared with {baseline.get('commit', 'unknown')[:12]} ({baseline.get('created_at', '?')})")
+    if baseline.get("config") != current.get("config"):
+        print("warning: configurations differ, deltas are not comparable")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            print(f"{name:<15} no baseline")
+            continue
+        deltas = []
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = change < 0 if higher_is_better else change > 0
+            mark = "!" if worse and abs(change) >= 10 else ""
+            deltas.append(f"{metric} {old:g} -> {new:g} ({change:+.1f}%){mark}")
+        print(f"{name:<15} " + ", ".join(deltas))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test of the WebApp and the bot on a synthetic database")
+    add_volume_arguments(parser)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--operations", type=int, default=2000, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--data-dir", default=tempfile.gettempdir(), help="where the seeded databases are kept")
+    parser.add_argument("--output", help=f"result JSON, by default {RESULTS_DIR}/<commit>.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="result JSON of an earlier run to compare with")
+    args = parser.parse_args()
+
+    # Приложение и бот работают с копией засеянной базы; задаётся до первого импорта database
+    pristine, working = database_paths(args)
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{working}"
+    os.environ.setdefault("BOT_TOKEN", "123456:bench")
+    os.environ.setdefault("WEBAPP_URL", "http://localhost")
+
+    revision = git_revision()
+    config = {
+        **{name: getattr(args, name) for name in (*DEFAULT_VOLUMES, "seed")},
+        "operations": args.operations,
+        "concurrency": args.concurrency,
+    }
+    scenarios = asyncio.run(run_suite(args, pristine, working))
+    report = {
+        **revision,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "scenarios": scenarios,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{revision['commit'][:12]}{'-dirty' if revision['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
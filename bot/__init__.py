@@ -1,6 +1,22 @@
-from .main import main
-from .config import settings
-from .handlers import router
-from .keyboards import get_main_menu, get_main_menu_webapp, get_profile_menu, get_admin_menu
+import importlib
+
+# Экспорты подгружаются лениво: database импортирует bot.config, а bot.main — database
+_EXPORTS = {
+    "main": "bot.main",
+    "settings": "bot.config",
+    "router": "bot.handlers",
+    "get_main_menu": "bot.keyboards",
+    "get_main_menu_webapp": "bot.keyboards",
+    "get_profile_menu": "bot.keyboards",
+    "get_admin_menu": "bot.keyboards",
+}
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
+
 
 __all__ = ["main", "settings", "router", "get_main_menu", "get_main_menu_webapp", "get_profile_menu", "get_admin_menu"]
\ No newline at end of file
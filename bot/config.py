@@ -8,6 +8,74 @@ class Settings(BaseSettings):
     WEBAPP_URL: str
     ADMIN_ID: Optional[int] = None
 
+    # Профиль движка БД: "production" или "dev" (см. database.database.ENGINE_PROFILES)
+    DB_PROFILE: str = "production"
+    DB_ECHO: Optional[bool] = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    DB_SLOW_QUERY_MS: Optional[float] = None
+    DB_SLOW_QUERY_SAMPLE_RATE: float = 1.0
+
+    # Реплика для чтения: PostgreSQL-реплика или файл SQLite (тот же файл — отдельный пул только для чтения).
+    # Без неё всё идёт в DATABASE_URL. После записи чтения пользователя DB_READ_YOUR_WRITES_SECONDS секунд
+    # идут в основную базу, чтобы он сразу видел свои изменения
+    DATABASE_REPLICA_URL: Optional[str] = None
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Режим запуска run.py: "single" — бот и веб в одном event loop, "multiprocess" — отдельные процессы
+    RUN_MODE: str = "single"
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    WEB_WORKERS: int = 1
+
+    # Получение обновлений: "polling" для локальной разработки или "webhook" через WebApp
+    BOT_MODE: str = "polling"
+    WEBHOOK_PATH: str = "/telegram/webhook"
+    WEBHOOK_URL: Optional[str] = None
+    WEBHOOK_SECRET: Optional[str] = None
+    WEBHOOK_MAX_CONNECTIONS: int = 40
+    WEBHOOK_MAX_CONCURRENCY: int = 32
+    WEBHOOK_MAX_PENDING: int = 1000
+
+    # Хранилище FSM: "database" (таблица fsm_states, общая для всех процессов) или "memory"
+    # FSM_CACHE_TTL=0 — без кеша процесса, FSM_FLUSH_INTERVAL=0 — запись сразу (webhook в нескольких воркерах включает оба)
+    FSM_STORAGE: str = "database"
+    FSM_FLUSH_INTERVAL: float = 1.0
+    FSM_STATE_TTL: int = 86400
+    FSM_CACHE_TTL: int = 60
+
+    # Токен для выгрузки каталога партнёрам (/export/catalog); без него выгрузка по HTTP отключена
+    EXPORT_TOKEN: Optional[str] = None
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Рекомендации: частота инкрементального обновления и полной пересборки (сек), 0 — без фонового пересчёта
+    RECOMMENDATIONS_INTERVAL: int = 300
+    RECOMMENDATIONS_REBUILD_INTERVAL: int = 86400
+    RECOMMENDATIONS_TOP_K: int = 20
+
+    # Уведомления и рассылки: общий лимит ниже ~30 сообщений/с Telegram и не больше 1/с в один чат; 0 — не отправлять
+    NOTIFY_RATE: float = 25
+    NOTIFY_CHAT_RATE: float = 1
+    NOTIFY_WORKERS: int = 8
+    NOTIFY_BATCH_SIZE: int = 100
+    NOTIFY_POLL_INTERVAL: float = 1.0
+    NOTIFY_MAX_ATTEMPTS: int = 5
+
+    # Миниатюры товаров на /img/{product_id}/{size}: кеш на диске с вытеснением по размеру и процессы для сжатия.
+    # IMAGE_SOURCE_DIR — каталог с исходниками для image_url без http(s)://, например для офлайн-проверки
+    # IMAGE_CACHE_MAX_MB соблюдает каждый процесс WebApp сам: при WEB_WORKERS > 1 каталог может вырасти до WEB_WORKERS × предела
+    IMAGE_CACHE_DIR: str = "image_cache"
+    IMAGE_CACHE_MAX_MB: int = 512
+    IMAGE_WORKERS: int = 2
+    IMAGE_SOURCE_DIR: Optional[str] = None
+    IMAGE_FETCH_TIMEOUT: float = 10
+    IMAGE_MAX_SOURCE_MB: int = 10
+
+    # Метрики Prometheus на /metrics: задержки обработчиков бота и маршрутов WebApp, число и время SQL-запросов
+    METRICS_ENABLED: bool = True
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,18 +1,60 @@
 from aiogram import Router, F, Bot
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Callable, Dict, Any, Awaitable
-from database import User, Seller, UserRole, SellerStatus, get_session
+from sqlalchemy import func, select
+import asyncio
+import gzip
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, Any, Awaitable, NamedTuple, Optional
+from database import User, Seller, Order, OrderItem, UserRole, SellerStatus, OrderStatus, LazySession, LRUCache, export_catalog, get_recommended_ids, catalog_cache, session_router
+from database import build_moderation_query, build_moderation_page, approve_sellers, reject_sellers, enqueue_notifications, enqueue_broadcast
+from database.metrics import QUERY_COUNT_BUCKETS, registry as metrics_registry, track_queries
+from database.sales_stats import DEFAULT_STATS_DAYS, get_seller_stats, set_order_status
 from bot.config import settings
-from bot.keyboards import get_main_menu, get_main_menu_webapp, get_profile_menu, get_admin_menu, get_seller_approval_keyboard, get_back_keyboard
+from bot.keyboards import get_main_menu, get_main_menu_webapp, get_profile_menu, get_admin_menu, get_moderation_keyboard, get_back_keyboard
 
 router = Router()
 
 
+BOT_HANDLER_SECONDS = metrics_registry.histogram("bot_handler_duration_seconds", "Bot handler latency", ("handler",))
+BOT_HANDLER_ERRORS = metrics_registry.counter("bot_handler_errors_total", "Bot handlers that raised", ("handler",))
+BOT_HANDLER_IN_PROGRESS = metrics_registry.gauge("bot_handlers_in_progress", "Bot handlers being processed", ("handler",))
+BOT_HANDLER_DB_QUERIES = metrics_registry.histogram("bot_handler_db_queries", "SQL statements per bot handler call", ("handler",), QUERY_COUNT_BUCKETS)
+BOT_HANDLER_DB_SECONDS = metrics_registry.histogram("bot_handler_db_seconds", "Time in SQL per bot handler call", ("handler",))
+
+
+class MetricsMiddleware(BaseMiddleware):
+    # Регистрируется первым, поэтому охватывает и сессию БД, и загрузку пользователя.
+    # Имя обработчика известно только после фильтров, так что это middleware уровня роутера
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        name = data["handler"].callback.__name__
+        BOT_HANDLER_IN_PROGRESS.inc(name)
+        started_at = time.perf_counter()
+        try:
+            with track_queries() as queries:
+                return await handler(event, data)
+        except Exception:
+            BOT_HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            BOT_HANDLER_IN_PROGRESS.dec(name)
+            BOT_HANDLER_SECONDS.observe(time.perf_counter() - started_at, name)
+            BOT_HANDLER_DB_QUERIES.observe(queries.queries, name)
+            BOT_HANDLER_DB_SECONDS.observe(queries.seconds, name)
+
+
 class DBSessionMiddleware(BaseMiddleware):
     async def __call__(
         self,
@@ -20,13 +62,62 @@ class DBSessionMiddleware(BaseMiddleware):
         event: Message,
         data: Dict[str, Any]
     ) -> Any:
-        async with get_session() as session:
+        from_user = data.get("event_from_user")
+        user_key = from_user.id if from_user else None
+        # read_session — для обработчиков, которые только читают: реплика, а сразу после своей записи — основная база
+        read_maker = session_router.for_read(user_key)
+        async with LazySession() as session, LazySession(read_maker) as read_session:
             data["session"] = session
-            return await handler(event, data)
+            # Без реплики или сразу после записи — та же сессия: одно соединение на обновление
+            data["read_session"] = session if read_maker is session_router.primary else read_session
+            try:
+                return await handler(event, data)
+            finally:
+                if user_key is not None and session.has_writes:
+                    session_router.mark_write(user_key)
+
+
+class UserIdentity(NamedTuple):
+    user_id: int
+    role: UserRole
+
+
+# telegram_id -> UserIdentity; сбрасывается при смене роли
+identity_cache = LRUCache(maxsize=10000, ttl=300)
 
 
+class UserIdentityMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        identity = None
+        from_user = data.get("event_from_user")
+
+        if from_user:
+            identity = identity_cache.get(from_user.id)
+            if identity is None:
+                result = await data["session"].execute(
+                    select(User.id, User.role).where(User.telegram_id == from_user.id)
+                )
+                row = result.first()
+                if row:
+                    identity = UserIdentity(row.id, row.role)
+                    identity_cache.set(from_user.id, identity)
+
+        data["identity"] = identity
+        return await handler(event, data)
+
+
+if settings.METRICS_ENABLED:
+    router.message.middleware(MetricsMiddleware())
+    router.callback_query.middleware(MetricsMiddleware())
 router.message.middleware(DBSessionMiddleware())
+router.message.middleware(UserIdentityMiddleware())
 router.callback_query.middleware(DBSessionMiddleware())
+router.callback_query.middleware(UserIdentityMiddleware())
 
 
 class BecomeSellerState(StatesGroup):
@@ -36,13 +127,10 @@ class BecomeSellerState(StatesGroup):
 
 
 @router.message(F.text == "/start")
-async def cmd_start(message: Message, session: AsyncSession):
+async def cmd_start(message: Message, session: AsyncSession, identity: Optional[UserIdentity]):
     user_id = message.from_user.id
 
-    result = await session.execute(select(User).where(User.telegram_id == user_id))
-    user = result.scalar_one_or_none()
-
-    if not user:
+    if identity is None:
         user = User(
             telegram_id=user_id,
             username=message.from_user.username,
@@ -52,21 +140,20 @@ async def cmd_start(message: Message, session: AsyncSession):
         session.add(user)
         await session.commit()
         await session.refresh(user)
+        identity = UserIdentity(user.id, user.role)
+        identity_cache.set(user_id, identity)
 
     welcome_text = f"Привет, {message.from_user.first_name}! 👋\n\nДобро пожаловать в маркетплейс!\n\nВыберите действие:"
 
-    if user.role == UserRole.ADMIN:
+    if identity.role == UserRole.ADMIN:
         await message.answer(welcome_text, reply_markup=get_admin_menu())
     else:
         await message.answer(welcome_text, reply_markup=get_main_menu_webapp())
 
 
 @router.callback_query(F.data == "main_menu")
-async def show_main_menu(callback: CallbackQuery, session: AsyncSession):
-    result = await session.execute(select(User).where(User.telegram_id == callback.from_user.id))
-    user = result.scalar_one_or_none()
-
-    if user and user.role == UserRole.ADMIN:
+async def show_main_menu(callback: CallbackQuery, identity: Optional[UserIdentity]):
+    if identity and identity.role == UserRole.ADMIN:
         await callback.message.edit_text("Главное меню администратора:", reply_markup=get_admin_menu())
     else:
         await callback.message.edit_text("Главное меню:", reply_markup=get_main_menu_webapp())
@@ -74,9 +161,8 @@ async def show_main_menu(callback: CallbackQuery, session: AsyncSession):
 
 
 @router.callback_query(F.data == "profile")
-async def show_profile(callback: CallbackQuery, session: AsyncSession):
-    result = await session.execute(select(User).where(User.telegram_id == callback.from_user.id))
-    user = result.scalar_one_or_none()
+async def show_profile(callback: CallbackQuery, read_session: AsyncSession, identity: Optional[UserIdentity]):
+    user = await read_session.get(User, identity.user_id) if identity else None
 
     if not user:
         await callback.answer("Пользователь не найден")
@@ -99,19 +185,16 @@ async def show_profile(callback: CallbackQuery, session: AsyncSession):
 
 
 @router.callback_query(F.data == "become_seller")
-async def become_seller(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    result = await session.execute(select(User).where(User.telegram_id == callback.from_user.id))
-    user = result.scalar_one_or_none()
-
-    if not user:
+async def become_seller(callback: CallbackQuery, state: FSMContext, session: AsyncSession, identity: Optional[UserIdentity]):
+    if not identity:
         await callback.answer("Сначала запустите бота командой /start")
         return
 
-    if user.role != UserRole.USER:
+    if identity.role != UserRole.USER:
         await callback.answer("Вы уже являетесь продавцом или администратором")
         return
 
-    result = await session.execute(select(Seller).where(Seller.user_id == user.id))
+    result = await session.execute(select(Seller).where(Seller.user_id == identity.user_id))
     existing_seller = result.scalar_one_or_none()
 
     if existing_seller and existing_seller.status == SellerStatus.PENDING:
@@ -139,15 +222,12 @@ async def process_iin(message: Message, state: FSMContext):
 
 
 @router.message(BecomeSellerState.description)
-async def process_description(message: Message, state: FSMContext, session: AsyncSession):
+async def process_description(message: Message, state: FSMContext, session: AsyncSession, identity: Optional[UserIdentity]):
     data = await state.get_data()
 
-    result = await session.execute(select(User).where(User.telegram_id == message.from_user.id))
-    user = result.scalar_one_or_none()
-
-    if user:
+    if identity:
         seller = Seller(
-            user_id=user.id,
+            user_id=identity.user_id,
             company_name=data['company_name'],
             iin=data.get('iin'),
             description=message.text,
@@ -160,66 +240,217 @@ async def process_description(message: Message, state: FSMContext, session: Asyn
     await message.answer("✅ Заявка отправлена на модерацию! Ожидайте подтверждения от администратора.", reply_markup=get_main_menu_webapp())
 
 
-@router.callback_query(F.data.startswith("admin_sellers"))
-async def admin_sellers(callback: CallbackQuery, session: AsyncSession):
-    result = await session.execute(select(User).where(User.telegram_id == callback.from_user.id))
-    user = result.scalar_one_or_none()
+MODERATION_DESCRIPTION_LIMIT = 300
+SELLER_APPROVED_TEXT = "✅ Ваша заявка продавца одобрена! Теперь в личном кабинете доступны товары и статистика продаж."
+SELLER_REJECTED_TEXT = "❌ Ваша заявка продавца отклонена. Вы можете подать новую заявку в личном кабинете."
 
-    if not user or user.role != UserRole.ADMIN:
-        await callback.answer("У вас нет прав администратора")
-        return
 
-    result = await session.execute(select(Seller).where(Seller.status == SellerStatus.PENDING))
-    pending_sellers = result.scalars().all()
+def is_admin(identity: Optional[UserIdentity]) -> bool:
+    return identity is not None and identity.role == UserRole.ADMIN
+
 
-    if not pending_sellers:
+async def show_moderation_page(callback: CallbackQuery, session: AsyncSession, cursor: str = ""):
+    # Одна страница очереди — одно сообщение; описания обрезаются, чтобы не упереться в 4096 символов
+    result = await session.execute(build_moderation_query(cursor or None))
+    page = build_moderation_page(result.all())
+    sellers = page["sellers"]
+
+    if not sellers and cursor:
+        # Страницу разобрали целиком — возвращаемся в начало очереди
+        await show_moderation_page(callback, session)
+        return
+
+    if not sellers:
         await callback.message.edit_text("Нет заявок на регистрацию продавцов.", reply_markup=get_admin_menu())
-        await callback.answer()
         return
 
     text = "📋 Заявки на регистрацию продавцов:\n\n"
-
-    for seller in pending_sellers:
-        text += f"🏢 {seller.company_name}\n"
+    for number, seller in enumerate(sellers, 1):
+        description = seller.description or "Не указано"
+        if len(description) > MODERATION_DESCRIPTION_LIMIT:
+            description = description[:MODERATION_DESCRIPTION_LIMIT] + "…"
+        text += f"{number}. 🏢 {seller.company_name}\n"
         text += f"ИИН: {seller.iin or 'Не указан'}\n"
-        text += f"Описание: {seller.description}\n\n"
+        text += f"Описание: {description}\n"
+        text += f"Подана: {seller.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
 
-    await callback.message.edit_text(text, reply_markup=get_back_keyboard())
+    keyboard = get_moderation_keyboard([seller.id for seller in sellers], cursor, page["next_cursor"])
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Очередь не изменилась с прошлого показа (повторное нажатие)
+        if "message is not modified" not in e.message:
+            raise
+
+
+@router.callback_query(F.data.startswith("admin_sellers"))
+async def admin_sellers(callback: CallbackQuery, read_session: AsyncSession, identity: Optional[UserIdentity]):
+    if not is_admin(identity):
+        await callback.answer("У вас нет прав администратора")
+        return
+
+    _, _, cursor = callback.data.partition(":")
+    await show_moderation_page(callback, read_session, cursor)
     await callback.answer()
 
 
+# Предел Telegram на отправку файла ботом
+TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024
+
+
+def gzip_file(path: str) -> str:
+    gzip_path = path + ".gz"
+    with open(path, "rb") as source, gzip.open(gzip_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    return gzip_path
+
+
+@router.callback_query(F.data == "admin_products")
+async def admin_products(callback: CallbackQuery, identity: Optional[UserIdentity]):
+    if not is_admin(identity):
+        await callback.answer("У вас нет прав администратора")
+        return
+
+    await callback.answer("Готовлю выгрузку каталога...")
+
+    # Выгрузка пишется во временный файл по мере чтения, без сборки всего каталога в памяти
+    fd, path = tempfile.mkstemp(prefix="catalog-", suffix=".csv")
+    paths = [path]
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in export_catalog("csv"):
+                f.write(chunk)
+
+        filename = "catalog.csv"
+        if os.path.getsize(path) > TELEGRAM_UPLOAD_LIMIT:
+            # Большой каталог: CSV хорошо сжимается, а если и сжатый не влезает — только выгрузка по HTTP
+            path = await asyncio.to_thread(gzip_file, path)
+            paths.append(path)
+            filename = "catalog.csv.gz"
+        if os.path.getsize(path) > TELEGRAM_UPLOAD_LIMIT:
+            text = "📦 Каталог слишком большой для отправки в Telegram.\n"
+            if settings.EXPORT_TOKEN:
+                export_url = settings.WEBAPP_URL.rstrip("/") + "/export/catalog?format=csv"
+                text += f"Скачайте выгрузку: {export_url} (заголовок Authorization: Bearer <EXPORT_TOKEN>)"
+            else:
+                text += "Задайте EXPORT_TOKEN, чтобы скачивать выгрузку по HTTP: GET /export/catalog?format=csv"
+            await callback.message.answer(text)
+            return
+
+        await callback.message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption="📦 Выгрузка каталога (CSV)",
+        )
+    finally:
+        for temporary_path in paths:
+            os.remove(temporary_path)
+
+
 @router.callback_query(F.data.startswith("approve_seller_"))
-async def approve_seller(callback: CallbackQuery, session: AsyncSession):
-    seller_id = int(callback.data.split("_")[-1])
-
-    result = await session.execute(select(Seller).where(Seller.id == seller_id))
-    seller = result.scalar_one_or_none()
-
-    if seller:
-        seller.status = SellerStatus.APPROVED
-        result = await session.execute(select(User).where(User.id == seller.user_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user.role = UserRole.SELLER
-        await session.commit()
+async def approve_seller(callback: CallbackQuery, session: AsyncSession, identity: Optional[UserIdentity]):
+    if not is_admin(identity):
+        await callback.answer("У вас нет прав администратора")
+        return
 
-    await callback.message.edit_text(f"✅ Продавец {seller.company_name} одобрен!", reply_markup=get_admin_menu())
-    await callback.answer()
+    seller_id, _, cursor = callback.data.removeprefix("approve_seller_").partition(":")
+    telegram_ids = await approve_sellers(session, [int(seller_id)])
+    if not telegram_ids:
+        # Двойное нажатие или заявку уже рассмотрел другой администратор
+        await callback.answer("Уже рассмотрено")
+        return
+    await enqueue_notifications(session, [(telegram_id, SELLER_APPROVED_TEXT) for telegram_id in telegram_ids])
+    await session.commit()
+    for telegram_id in telegram_ids:
+        identity_cache.pop(telegram_id)
+        # Новый продавец откроет профиль по уведомлению — пусть увидит роль без задержки реплики
+        session_router.mark_write(telegram_id)
+
+    await show_moderation_page(callback, session, cursor)
+    await callback.answer("✅ Продавец одобрен")
 
 
 @router.callback_query(F.data.startswith("reject_seller_"))
-async def reject_seller(callback: CallbackQuery, session: AsyncSession):
-    seller_id = int(callback.data.split("_")[-1])
+async def reject_seller(callback: CallbackQuery, session: AsyncSession, identity: Optional[UserIdentity]):
+    if not is_admin(identity):
+        await callback.answer("У вас нет прав администратора")
+        return
 
-    result = await session.execute(select(Seller).where(Seller.id == seller_id))
-    seller = result.scalar_one_or_none()
+    seller_id, _, cursor = callback.data.removeprefix("reject_seller_").partition(":")
+    telegram_ids = await reject_sellers(session, [int(seller_id)])
+    if not telegram_ids:
+        await callback.answer("Уже рассмотрено")
+        return
+    await enqueue_notifications(session, [(telegram_id, SELLER_REJECTED_TEXT) for telegram_id in telegram_ids])
+    await session.commit()
 
-    if seller:
-        seller.status = SellerStatus.REJECTED
-        await session.commit()
+    await show_moderation_page(callback, session, cursor)
+    await callback.answer("❌ Заявка отклонена")
 
-    await callback.message.edit_text(f"❌ Заявка продавца {seller.company_name} отклонена.", reply_markup=get_admin_menu())
-    await callback.answer()
+
+@router.callback_query(F.data.startswith("approve_page:"))
+async def approve_page(callback: CallbackQuery, session: AsyncSession, identity: Optional[UserIdentity]):
+    if not is_admin(identity):
+        await callback.answer("У вас нет прав администратора")
+        return
+
+    # Одобряются ровно показанные заявки, одной транзакцией
+    seller_ids = [int(seller_id) for seller_id in callback.data.removeprefix("approve_page:").split(",")]
+    telegram_ids = await approve_sellers(session, seller_ids)
+    if not telegram_ids:
+        await callback.answer("Уже рассмотрено")
+        return
+    await enqueue_notifications(session, [(telegram_id, SELLER_APPROVED_TEXT) for telegram_id in telegram_ids])
+    await session.commit()
+    for telegram_id in telegram_ids:
+        identity_cache.pop(telegram_id)
+        session_router.mark_write(telegram_id)
+
+    await show_moderation_page(callback, session)
+    await callback.answer(f"✅ Одобрено заявок: {len(telegram_ids)}")
+
+
+@router.message(F.text.startswith("/broadcast"))
+async def broadcast(message: Message, session: AsyncSession, identity: Optional[UserIdentity]):
+    if not is_admin(identity):
+        await message.answer("У вас нет прав администратора")
+        return
+
+    text = message.text.removeprefix("/broadcast").strip()
+    if not text:
+        await message.answer("Использование: /broadcast <текст сообщения>")
+        return
+
+    # Рассылка ставится в очередь уведомлений и уходит в темпе, допустимом для Telegram
+    recipients = await enqueue_broadcast(session, text)
+    await session.commit()
+    await message.answer(f"📣 Рассылка поставлена в очередь: {recipients} получателей")
+
+
+ORDER_STATUS_COMMANDS = {
+    "confirm": OrderStatus.CONFIRMED,
+    "deliver": OrderStatus.DELIVERED,
+    "cancel": OrderStatus.CANCELLED,
+}
+
+
+@router.message(F.text.startswith("/order"))
+async def change_order_status(message: Message, session: AsyncSession, identity: Optional[UserIdentity]):
+    if not is_admin(identity):
+        await message.answer("У вас нет прав администратора")
+        return
+
+    args = message.text.split()
+    if len(args) != 3 or not args[1].isdigit() or args[2] not in ORDER_STATUS_COMMANDS:
+        await message.answer("Использование: /order <номер заказа> confirm|deliver|cancel")
+        return
+
+    # Статус меняется только через set_order_status: статистика продавцов обновляется в той же транзакции
+    changed = await set_order_status(session, int(args[1]), ORDER_STATUS_COMMANDS[args[2]])
+    await session.commit()
+    if not changed:
+        await message.answer("Заказ не найден или уже в этом статусе")
+        return
+    await message.answer(f"✅ Заказ №{args[1]}: статус изменён")
 
 
 @router.callback_query(F.data == "favorites")
@@ -234,13 +465,97 @@ async def show_cart(callback: CallbackQuery):
     await callback.answer()
 
 
+ORDER_HISTORY_LIMIT = 10
+
+
 @router.callback_query(F.data == "order_history")
-async def show_order_history(callback: CallbackQuery):
-    await callback.message.edit_text("📜 История покупок\n\nФункционал в разработке...", reply_markup=get_back_keyboard())
+async def show_order_history(callback: CallbackQuery, read_session: AsyncSession, identity: Optional[UserIdentity]):
+    if not identity:
+        await callback.answer("Пользователь не найден")
+        return
+
+    # Последние заказы с числом позиций — один запрос по индексу (user_id, created_at)
+    result = await read_session.execute(
+        select(Order.id, Order.created_at, Order.total_amount, Order.status, func.count(OrderItem.id))
+        .join(OrderItem, OrderItem.order_id == Order.id, isouter=True)
+        .where(Order.user_id == identity.user_id)
+        .group_by(Order.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(ORDER_HISTORY_LIMIT)
+    )
+    orders = result.all()
+
+    if not orders:
+        await callback.message.edit_text("📜 История покупок\n\nУ вас пока нет заказов.", reply_markup=get_back_keyboard())
+        await callback.answer()
+        return
+
+    status_text = {
+        OrderStatus.PENDING: "⏳ Ожидает подтверждения",
+        OrderStatus.CONFIRMED: "✅ Подтверждён",
+        OrderStatus.DELIVERED: "📦 Доставлен",
+        OrderStatus.CANCELLED: "❌ Отменён",
+    }
+
+    text = "📜 История покупок:\n\n"
+    for order_id, created_at, total_amount, status, items_count in orders:
+        text += f"Заказ №{order_id} от {created_at.strftime('%d.%m.%Y')}\n"
+        text += f"Товаров: {items_count}, сумма: {total_amount} ₸\n"
+        text += f"{status_text.get(status, status.value)}\n\n"
+
+    await callback.message.edit_text(text, reply_markup=get_back_keyboard())
     await callback.answer()
 
 
 @router.callback_query(F.data == "recommendations")
-async def show_recommendations(callback: CallbackQuery):
-    await callback.message.edit_text("💎 Рекомендации товаров\n\nФункционал в разработке...", reply_markup=get_back_keyboard())
-    await callback.answer()
\ No newline at end of file
+async def show_recommendations(callback: CallbackQuery, read_session: AsyncSession):
+    product_ids = await get_recommended_ids(read_session, callback.from_user.id, limit=5)
+    products = await catalog_cache.get_products(read_session, product_ids)
+
+    if not products:
+        await callback.message.edit_text(
+            "💎 Рекомендации товаров\n\nПока нечего посоветовать — добавьте товары в избранное или корзину.",
+            reply_markup=get_back_keyboard()
+        )
+        await callback.answer()
+        return
+
+    text = "💎 Рекомендации для вас:\n\n"
+    for product_id in product_ids:
+        product = products.get(product_id)
+        if product:
+            text += f"📦 {product['name']} — {product['price']} ₸\n"
+            text += f"Продавец: {product['seller_name']}\n\n"
+
+    await callback.message.edit_text(text, reply_markup=get_back_keyboard())
+    await callback.answer()
+
+
+@router.callback_query(F.data == "sales_stats")
+async def show_sales_stats(callback: CallbackQuery, read_session: AsyncSession, identity: Optional[UserIdentity]):
+    seller_id = None
+    if identity and identity.role == UserRole.SELLER:
+        result = await read_session.execute(select(Seller.id).where(Seller.user_id == identity.user_id))
+        seller_id = result.scalar()
+
+    if seller_id is None:
+        await callback.answer("Статистика доступна только продавцам", show_alert=True)
+        return
+
+    # Готовые агрегаты: два чтения по ключу вместо сканирования заказов
+    stats = await get_seller_stats(read_session, seller_id)
+    totals = stats["totals"]
+
+    text = "📊 Статистика продаж\n\n"
+    text += f"Заказов: {totals['orders_count']}\n"
+    text += f"Продано товаров: {totals['items_sold']}\n"
+    text += f"Выручка: {totals['revenue']} ₸\n"
+    text += f"Комиссия маркетплейса: {totals['commission']} ₸\n"
+
+    if stats["daily"]:
+        text += f"\nЗа последние {DEFAULT_STATS_DAYS} дней:\n"
+        for day in stats["daily"]:
+            text += f"{day['day']}: {day['orders_count']} зак., {day['revenue']} ₸\n"
+
+    await callback.message.edit_text(text, reply_markup=get_back_keyboard())
+    await callback.answer()
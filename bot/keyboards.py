@@ -1,3 +1,4 @@
+from typing import Optional, Sequence
 from aiogram import Router
 from aiogram.types import (
     InlineKeyboardMarkup,
@@ -11,78 +12,114 @@ from bot.config import settings
 router = Router()
 
 
-def get_main_menu():
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="🏠 Главное меню")],
-            [KeyboardButton(text="⭐ Избранное")],
-            [KeyboardButton(text="🛒 Корзина")],
-            [KeyboardButton(text="👤 Личный кабинет")],
-        ],
-        resize_keyboard=True
-    )
-    return keyboard
+def _build_profile_menu(user_role: str) -> InlineKeyboardMarkup:
+    inline_keyboard = [
+        [InlineKeyboardButton(text="📜 История покупок", callback_data="order_history")],
+        [InlineKeyboardButton(text="💎 Рекомендации", callback_data="recommendations")],
+    ]
 
+    if user_role == "user":
+        inline_keyboard.append([InlineKeyboardButton(text="🏪 Стать продавцом", callback_data="become_seller")])
+    elif user_role == "seller":
+        inline_keyboard.append([InlineKeyboardButton(text="📦 Мои товары", callback_data="my_products")])
+        inline_keyboard.append([InlineKeyboardButton(text="📊 Статистика продаж", callback_data="sales_stats")])
 
-def get_main_menu_webapp():
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="🛍️ Открыть магазин",
-                web_app=WebAppInfo(url=settings.WEBAPP_URL)
-            )],
-            [InlineKeyboardButton(text="⭐ Избранное", callback_data="favorites")],
-            [InlineKeyboardButton(text="🛒 Корзина", callback_data="cart")],
-            [InlineKeyboardButton(text="👤 Личный кабинет", callback_data="profile")],
-        ]
-    )
-    return keyboard
+    inline_keyboard.append([InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")])
 
+    return InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
 
-def get_profile_menu(user_role: str = "user"):
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
 
-    keyboard.inline_keyboard.append([InlineKeyboardButton(text="📜 История покупок", callback_data="order_history")])
-    keyboard.inline_keyboard.append([InlineKeyboardButton(text="💎 Рекомендации", callback_data="recommendations")])
+# Статические клавиатуры собираются один раз при импорте. Экземпляры общие и не заморожены
+# (модели aiogram изменяемы) — обработчики не должны их менять, для вариаций строится новая клавиатура
+MAIN_MENU = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="🏠 Главное меню")],
+        [KeyboardButton(text="⭐ Избранное")],
+        [KeyboardButton(text="🛒 Корзина")],
+        [KeyboardButton(text="👤 Личный кабинет")],
+    ],
+    resize_keyboard=True
+)
 
-    if user_role == "user":
-        keyboard.inline_keyboard.append([InlineKeyboardButton(text="🏪 Стать продавцом", callback_data="become_seller")])
-    elif user_role == "seller":
-        keyboard.inline_keyboard.append([InlineKeyboardButton(text="📦 Мои товары", callback_data="my_products")])
-        keyboard.inline_keyboard.append([InlineKeyboardButton(text="📊 Статистика продаж", callback_data="sales_stats")])
+MAIN_MENU_WEBAPP = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(
+            text="🛍️ Открыть магазин",
+            web_app=WebAppInfo(url=settings.WEBAPP_URL)
+        )],
+        [InlineKeyboardButton(text="⭐ Избранное", callback_data="favorites")],
+        [InlineKeyboardButton(text="🛒 Корзина", callback_data="cart")],
+        [InlineKeyboardButton(text="👤 Личный кабинет", callback_data="profile")],
+    ]
+)
 
-    keyboard.inline_keyboard.append([InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")])
+PROFILE_MENUS = {
+    role: _build_profile_menu(role)
+    for role in ("user", "seller", "admin")
+}
+
+ADMIN_MENU = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="👥 Продавцы", callback_data="admin_sellers")],
+        [InlineKeyboardButton(text="📦 Все товары", callback_data="admin_products")],
+        [InlineKeyboardButton(text="🛒 Все заказы", callback_data="admin_orders")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")],
+    ]
+)
 
-    return keyboard
+BACK_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")]
+    ]
+)
+
+
+def get_main_menu():
+    return MAIN_MENU
+
+
+def get_main_menu_webapp():
+    return MAIN_MENU_WEBAPP
+
+
+def get_profile_menu(user_role: str = "user"):
+    markup = PROFILE_MENUS.get(user_role)
+    if markup is None:
+        markup = _build_profile_menu(user_role)
+    return markup
 
 
 def get_admin_menu():
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="👥 Продавцы", callback_data="admin_sellers")],
-            [InlineKeyboardButton(text="📦 Все товары", callback_data="admin_products")],
-            [InlineKeyboardButton(text="🛒 Все заказы", callback_data="admin_orders")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")],
-        ]
-    )
-    return keyboard
+    return ADMIN_MENU
 
 
-def get_seller_approval_keyboard(seller_id: int):
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Одобрить", callback_data=f"approve_seller_{seller_id}")],
-            [InlineKeyboardButton(text="❌ Отклонить", callback_data=f"reject_seller_{seller_id}")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_sellers")],
+def get_moderation_keyboard(seller_ids: Sequence[int], cursor: str = "", next_cursor: Optional[str] = None):
+    # Кнопки строки заявки помнят курсор страницы, чтобы после решения показать ту же страницу
+    inline_keyboard = [
+        [
+            InlineKeyboardButton(text=f"✅ {number}", callback_data=f"approve_seller_{seller_id}:{cursor}"),
+            InlineKeyboardButton(text=f"❌ {number}", callback_data=f"reject_seller_{seller_id}:{cursor}"),
         ]
-    )
-    return keyboard
+        for number, seller_id in enumerate(seller_ids, 1)
+    ]
+    if len(seller_ids) > 1:
+        # callback_data до 64 байт: на странице из 5 заявок хватает для id до 10^7
+        inline_keyboard.append([InlineKeyboardButton(
+            text="✅ Одобрить всю страницу",
+            callback_data="approve_page:" + ",".join(map(str, seller_ids)),
+        )])
+
+    navigation = []
+    if cursor:
+        navigation.append(InlineKeyboardButton(text="⏮ В начало", callback_data="admin_sellers"))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton(text="➡️ Далее", callback_data=f"admin_sellers:{next_cursor}"))
+    if navigation:
+        inline_keyboard.append(navigation)
+
+    inline_keyboard.append([InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
 
 
 def get_back_keyboard():
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")]
-        ]
-    )
-    return keyboard
\ No newline at end of file
+    return BACK_KEYBOARD
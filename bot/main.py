@@ -1,26 +1,55 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from bot.config import settings
 from bot.handlers import router as handlers_router
-from database import init_db, get_session
+from bot.storage import SQLAlchemyStorage
+from database import init_db
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    bot = Bot(token=settings.BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+def create_bot() -> Bot:
+    return Bot(token=settings.BOT_TOKEN)
 
-    await init_db()
 
+def create_storage() -> BaseStorage:
+    if settings.FSM_STORAGE == "memory":
+        return MemoryStorage()
+    # Webhook в нескольких воркерах: сообщения одного пользователя могут попасть в разные процессы,
+    # поэтому состояние читается из БД и пишется сразу, без кеша процесса
+    shared = settings.BOT_MODE == "webhook" and settings.RUN_MODE == "multiprocess" and settings.WEB_WORKERS > 1
+    return SQLAlchemyStorage(
+        flush_interval=0 if shared else settings.FSM_FLUSH_INTERVAL,
+        state_ttl=settings.FSM_STATE_TTL,
+        cache_ttl=0 if shared else settings.FSM_CACHE_TTL,
+    )
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=create_storage())
     dp.include_router(handlers_router)
+    return dp
+
+
+async def start_polling(handle_signals: bool = True):
+    bot = create_bot()
+    dp = create_dispatcher()
+
+    # getUpdates не работает, пока у бота установлен webhook
+    await bot.delete_webhook()
 
     logger.info("Бот запущен...")
-    await dp.start_polling(bot)
+    await dp.start_polling(bot, handle_signals=handle_signals)
+
+
+async def main():
+    await init_db()
+    await start_polling()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
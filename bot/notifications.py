@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from bot.config import settings
+from database import (
+    LRUCache,
+    Notification,
+    async_session_maker,
+    claim_notifications,
+    delete_notifications,
+    reschedule_notification,
+    serialized_writes,
+)
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждать, если отправка оборвалась до ответа Telegram; взятое сообщение станет due снова
+NOTIFY_LEASE = 60
+MAX_RETRY_DELAY = 3600
+
+
+class TokenBucket:
+    # Каждый вызов резервирует токен и ждёт своей очереди; баланс уходит в минус,
+    # поэтому ожидающие выстраиваются по порядку без блокировок
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return now
+
+    def reserve(self) -> float:
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        # После RetryAfter следующий токен выдаётся не раньше чем через seconds
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float,
+        chat_rate: float,
+        workers: int,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        session_maker=async_session_maker,
+    ):
+        self.bot = bot
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.session_maker = session_maker
+        self.chat_interval = 1 / chat_rate
+        self.max_in_flight = batch_size * 2
+
+        # Без запаса на всплеск: иначе в одну секунду попадут запас и текущий поток
+        self._bucket = TokenBucket(rate, 1)
+        # chat_id -> момент, раньше которого в чат писать нельзя
+        self._chat_ready_at = LRUCache(maxsize=100000, ttl=3600)
+        # Сообщения одного чата идут по очереди: в работе не больше одного на чат
+        self._chats: Dict[int, Deque[Notification]] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._in_flight: Set[int] = set()
+        self._sent: List[int] = []
+        self._retries: List[Tuple[int, int, Optional[float], Optional[str]]] = []
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.throttled = 0
+
+    async def run(self) -> None:
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            while True:
+                # Новые сообщения берутся, только пока есть место: длинная рассылка не оседает в памяти
+                limit = min(self.batch_size, self.max_in_flight - len(self._in_flight))
+                try:
+                    notifications = await self._sync(limit)
+                except Exception:
+                    logger.exception("Не удалось прочитать очередь уведомлений")
+                    notifications = []
+
+                for notification in notifications:
+                    # Аренда истекла, пока сообщение ждало своей очереди: второй раз не ставим
+                    if notification.id not in self._in_flight:
+                        self._submit(notification)
+
+                if len(notifications) < self.batch_size:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self._sync(0)
+
+    def _submit(self, notification: Notification) -> None:
+        self._in_flight.add(notification.id)
+        queue = self._chats.get(notification.chat_id)
+        if queue is not None:
+            queue.append(notification)
+            return
+        self._chats[notification.chat_id] = deque()
+        self._queue.put_nowait(notification)
+
+    def _finish(self, notification: Notification) -> None:
+        self._in_flight.discard(notification.id)
+        queue = self._chats.get(notification.chat_id)
+        if queue:
+            self._queue.put_nowait(queue.popleft())
+        else:
+            self._chats.pop(notification.chat_id, None)
+
+    async def _sync(self, limit: int) -> List[Notification]:
+        # Итоги отправки и взятие следующей пачки — одной транзакцией
+        sent, self._sent = self._sent, []
+        retries, self._retries = self._retries, []
+        try:
+            async with self.session_maker() as session:
+                async with serialized_writes(session):
+                    await delete_notifications(session, sent)
+                    for notification_id, attempts, delay, error in retries:
+                        await reschedule_notification(session, notification_id, attempts, delay, error)
+                    notifications = []
+                    if limit > 0:
+                        notifications = await claim_notifications(session, limit, NOTIFY_LEASE)
+                    await session.commit()
+        except Exception:
+            self._sent.extend(sent)
+            self._retries.extend(retries)
+            raise
+        return notifications
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            notification = await self._queue.get()
+            try:
+                # Чат ждёт своей очереди отдельно, не занимая воркер и общий лимит
+                delay = self._chat_ready_at.get(notification.chat_id, 0.0) - time.monotonic()
+                if delay > 0:
+                    loop.call_later(delay, self._queue.put_nowait, notification)
+                    continue
+                await self._bucket.acquire()
+                self._chat_ready_at.set(notification.chat_id, time.monotonic() + self.chat_interval)
+                await self._send(notification)
+            except Exception:
+                logger.exception("Ошибка отправки уведомления %s", notification.id)
+            self._finish(notification)
+
+    async def _send(self, notification: Notification) -> None:
+        try:
+            await self.bot.send_message(notification.chat_id, notification.text)
+        except TelegramRetryAfter as e:
+            # Непонятно, какой лимит сработал — притормаживаем и чат, и всю рассылку
+            self.throttled += 1
+            self._chat_ready_at.set(notification.chat_id, time.monotonic() + e.retry_after)
+            self._bucket.pause(e.retry_after)
+            self._retries.append((notification.id, notification.attempts, e.retry_after, None))
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Бот заблокирован или чат не существует — повтор не поможет
+            self.failed += 1
+            self._retries.append((notification.id, notification.attempts + 1, None, str(e)[:500]))
+        except Exception as e:
+            attempts = notification.attempts + 1
+            if attempts >= self.max_attempts:
+                self.failed += 1
+                self._retries.append((notification.id, attempts, None, str(e)[:500]))
+            else:
+                self.retried += 1
+                delay = min(self.poll_interval * 2 ** attempts, MAX_RETRY_DELAY)
+                self._retries.append((notification.id, attempts, delay, str(e)[:500]))
+        else:
+            self.sent += 1
+            self._sent.append(notification.id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "throttled": self.throttled,
+            "queued": self._queue.qsize(),
+            "active_chats": len(self._chats),
+            "in_flight": len(self._in_flight),
+        }
+
+
+def create_dispatcher(bot: Bot) -> NotificationDispatcher:
+    return NotificationDispatcher(
+        bot,
+        rate=settings.NOTIFY_RATE,
+        chat_rate=settings.NOTIFY_CHAT_RATE,
+        workers=settings.NOTIFY_WORKERS,
+        batch_size=settings.NOTIFY_BATCH_SIZE,
+        poll_interval=settings.NOTIFY_POLL_INTERVAL,
+        max_attempts=settings.NOTIFY_MAX_ATTEMPTS,
+    )
+
+
+async def run_notifications_job() -> None:
+    from bot.main import create_bot
+
+    bot = create_bot()
+    try:
+        await create_dispatcher(bot).run()
+    finally:
+        await bot.session.close()
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import delete
+from database import FSMRecord, LRUCache, async_session_maker, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+FSMEntry = Tuple[Optional[str], Dict[str, Any]]
+
+
+class SQLAlchemyStorage(BaseStorage):
+    # Состояния FSM хранятся в таблице fsm_states; чтения обслуживаются из кеша,
+    # а записи копятся и сбрасываются в БД одной транзакцией раз в flush_interval.
+    # Кеш и отложенная запись видны только своему процессу: если обновления обрабатывают несколько
+    # процессов, нужны cache_ttl=0 (читать всегда из БД) и flush_interval=0 (писать сразу)
+    def __init__(
+        self,
+        session_maker=async_session_maker,
+        key_builder: Optional[KeyBuilder] = None,
+        flush_interval: float = 1.0,
+        state_ttl: float = 86400,
+        cache_ttl: Optional[float] = 60,
+        cache_size: int = 10000,
+    ):
+        self.session_maker = session_maker
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self.flush_interval = flush_interval
+        self.state_ttl = state_ttl
+        self._cache = LRUCache(maxsize=cache_size, ttl=cache_ttl) if cache_ttl != 0 else None
+        self._dirty: Dict[str, FSMEntry] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def _get_entry(self, key: StorageKey) -> FSMEntry:
+        storage_key = self.key_builder.build(key)
+
+        entry = self._dirty.get(storage_key)
+        if entry is None and self._cache is not None:
+            entry = self._cache.get(storage_key)
+        if entry is not None:
+            return entry
+
+        async with self.session_maker() as session:
+            record = await session.get(FSMRecord, storage_key)
+
+        entry = (None, {})
+        if record is not None and record.updated_at >= datetime.utcnow() - timedelta(seconds=self.state_ttl):
+            entry = (record.state, json.loads(record.data) if record.data else {})
+
+        if self._cache is not None:
+            self._cache.set(storage_key, entry)
+        return entry
+
+    async def _put_entry(self, key: StorageKey, entry: FSMEntry) -> None:
+        storage_key = self.key_builder.build(key)
+        if self._cache is not None:
+            self._cache.set(storage_key, entry)
+        self._dirty[storage_key] = entry
+
+        if self.flush_interval <= 0:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data = await self._get_entry(key)
+        state_name = state.state if isinstance(state, State) else state
+        await self._put_entry(key, (state_name, data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get_entry(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state, _ = await self._get_entry(key)
+        await self._put_entry(key, (state, data.copy()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get_entry(key)
+        return data.copy()
+
+    async def _flush_later(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось сохранить состояния FSM")
+            # Записи, появившиеся во время сброса, уйдут следующей пачкой
+            if not self._dirty:
+                return
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+
+            dirty, self._dirty = self._dirty, {}
+            now = datetime.utcnow()
+            upserts = []
+            deletes = []
+            for storage_key, (state, data) in dirty.items():
+                if state is None and not data:
+                    deletes.append(storage_key)
+                else:
+                    upserts.append({
+                        "key": storage_key,
+                        "state": state,
+                        "data": json.dumps(data, ensure_ascii=False) if data else None,
+                        "updated_at": now,
+                    })
+
+            try:
+                async with self.session_maker() as session:
+                    if upserts:
+                        stmt = dialect_insert(session, FSMRecord)
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=[FSMRecord.key],
+                            set_={
+                                "state": stmt.excluded.state,
+                                "data": stmt.excluded.data,
+                                "updated_at": stmt.excluded.updated_at,
+                            },
+                        )
+                        await session.execute(stmt, upserts)
+                    if deletes:
+                        await session.execute(delete(FSMRecord).where(FSMRecord.key.in_(deletes)))
+                    # Брошенные незавершённые сценарии удаляются по TTL
+                    await session.execute(
+                        delete(FSMRecord).where(FSMRecord.updated_at < now - timedelta(seconds=self.state_ttl))
+                    )
+                    await session.commit()
+            except BaseException:
+                # Вернуть несохранённые записи, если их не перезаписали новые. BaseException — чтобы
+                # и отмена фоновой задачи в close() не теряла пачку: её допишет следующий flush()
+                for storage_key, entry in dirty.items():
+                    self._dirty.setdefault(storage_key, entry)
+                raise
+
+    async def close(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
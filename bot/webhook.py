@@ -0,0 +1,168 @@
+import asyncio
+import hmac
+import logging
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, Optional, Set
+from bot.config import settings
+
+if TYPE_CHECKING:
+    # aiogram импортируется секундами; WebApp без webhook обходится без него
+    from aiogram import Bot, Dispatcher
+    from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_key(update: "Update") -> int:
+    # Обновления одного чата обрабатываются строго по очереди
+    try:
+        event = update.event
+    except LookupError:
+        return -update.update_id
+
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+
+    from_user = getattr(event, "from_user", None)
+    if from_user is not None:
+        return from_user.id
+
+    return -update.update_id
+
+
+class UpdateProcessor:
+    def __init__(self, dispatcher: "Dispatcher", bot: "Bot", max_concurrency: int, max_pending: int):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queues: Dict[int, Deque["Update"]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.max_concurrency = max_concurrency
+        self.pending = 0
+        self.in_flight = 0
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_pending_seen = 0
+
+    def submit(self, update: "Update") -> bool:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return False
+
+        self.received += 1
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+
+        key = get_update_key(update)
+        queue = self._queues.get(key)
+        if queue is not None:
+            # Чат уже обрабатывается: обновление заберёт тот же обработчик
+            queue.append(update)
+            return True
+
+        queue = deque([update])
+        self._queues[key] = queue
+        task = asyncio.create_task(self._drain(key, queue))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _drain(self, key: int, queue: Deque["Update"]) -> None:
+        try:
+            while queue:
+                update = queue[0]
+                async with self._semaphore:
+                    self.in_flight += 1
+                    try:
+                        await self.dispatcher.feed_update(self.bot, update)
+                        self.processed += 1
+                    except Exception:
+                        self.failed += 1
+                        logger.exception("Ошибка обработки обновления %s", update.update_id)
+                    finally:
+                        self.in_flight -= 1
+                queue.popleft()
+                self.pending -= 1
+        finally:
+            self._queues.pop(key, None)
+
+    async def close(self, timeout: float = 10) -> None:
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "active_chats": len(self._queues),
+            "max_pending": self.max_pending,
+            "max_pending_seen": self.max_pending_seen,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+class TelegramWebhook:
+    def __init__(self):
+        self.bot: Optional["Bot"] = None
+        self.dispatcher: Optional["Dispatcher"] = None
+        self.processor: Optional[UpdateProcessor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.BOT_MODE == "webhook"
+
+    def verify_secret(self, token: Optional[str]) -> bool:
+        return hmac.compare_digest((token or "").encode(), settings.WEBHOOK_SECRET.encode())
+
+    async def start(self) -> None:
+        from bot.main import create_bot, create_dispatcher
+
+        if not settings.WEBHOOK_SECRET:
+            raise RuntimeError("WEBHOOK_SECRET must be set when BOT_MODE=webhook")
+
+        self.bot = create_bot()
+        self.dispatcher = dispatcher = create_dispatcher()
+        self.processor = UpdateProcessor(
+            dispatcher,
+            self.bot,
+            max_concurrency=settings.WEBHOOK_MAX_CONCURRENCY,
+            max_pending=settings.WEBHOOK_MAX_PENDING,
+        )
+
+        webhook_url = settings.WEBHOOK_URL or settings.WEBAPP_URL.rstrip("/") + settings.WEBHOOK_PATH
+        await self.bot.set_webhook(
+            url=webhook_url,
+            secret_token=settings.WEBHOOK_SECRET,
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+        logger.info("Бот запущен в режиме webhook: %s", webhook_url)
+
+    async def stop(self) -> None:
+        if self.processor is not None:
+            await self.processor.close()
+        if self.dispatcher is not None:
+            await self.dispatcher.storage.close()
+        if self.bot is not None:
+            await self.bot.session.close()
+
+    def feed(self, payload: Dict[str, Any]) -> bool:
+        from aiogram.types import Update
+
+        update = Update.model_validate(payload, context={"bot": self.bot})
+        return self.processor.submit(update)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.processor.stats() if self.processor else {}
+
+
+telegram_webhook = TelegramWebhook()
@@ -1,5 +1,16 @@
-from .models import Base, User, Seller, Product, Order, OrderItem, Favorite, CartItem, UserRole, SellerStatus, OrderStatus
-from .database import engine, async_session_maker, get_session, init_db
+from .models import Base, User, Seller, Product, Order, OrderItem, Favorite, CartItem, FSMRecord, ProductRecommendation, SellerSalesDaily, SellerSalesTotal, NotificationOutbox, UserRole, SellerStatus, OrderStatus
+from .database import engine, async_session_maker, get_session, init_db, LazySession, dialect_insert, serialized_writes
+from .database import read_engine, read_session_maker, get_read_session, dispose_engines
+from .routing import SessionRouter, session_router
+from .catalog import build_catalog_query, build_catalog_page, serialize_product, image_version, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .cache import LRUCache, CatalogCache, catalog_cache
+from .export import EXPORT_COLUMNS, EXPORT_FORMATS, build_export_query, export_catalog
+from .search import build_search_query, build_search_page, parse_search_terms, install_search, rebuild_search
+from .recommendations import get_recommended_ids
+from .checkout import CheckoutError, CheckoutResult, checkout_cart
+from .moderation import build_moderation_query, build_moderation_page, approve_sellers, reject_sellers, MODERATION_PAGE_SIZE
+from .outbox import Notification, enqueue_notifications, enqueue_broadcast, claim_notifications, delete_notifications, reschedule_notification
+from .cart import upsert_favorite, delete_favorite, upsert_cart_item, delete_cart_item, delete_cart
 
 __all__ = [
     "Base",
@@ -10,11 +21,63 @@ __all__ = [
     "OrderItem",
     "Favorite",
     "CartItem",
+    "FSMRecord",
+    "ProductRecommendation",
+    "SellerSalesDaily",
+    "SellerSalesTotal",
+    "NotificationOutbox",
     "UserRole",
     "SellerStatus",
     "OrderStatus",
     "engine",
     "async_session_maker",
     "get_session",
+    "read_engine",
+    "read_session_maker",
+    "get_read_session",
+    "dispose_engines",
+    "SessionRouter",
+    "session_router",
     "init_db",
+    "LazySession",
+    "dialect_insert",
+    "build_catalog_query",
+    "build_catalog_page",
+    "serialize_product",
+    "image_version",
+    "DEFAULT_PAGE_SIZE",
+    "MAX_PAGE_SIZE",
+    "LRUCache",
+    "CatalogCache",
+    "catalog_cache",
+    "upsert_favorite",
+    "delete_favorite",
+    "upsert_cart_item",
+    "delete_cart_item",
+    "delete_cart",
+    "EXPORT_COLUMNS",
+    "EXPORT_FORMATS",
+    "build_export_query",
+    "export_catalog",
+    "build_search_query",
+    "build_search_page",
+    "parse_search_terms",
+    "install_search",
+    "rebuild_search",
+    "get_recommended_ids",
+    "CheckoutError",
+    "CheckoutResult",
+    "checkout_cart",
+    "serialized_writes",
+    "build_moderation_query",
+    "build_moderation_page",
+    "approve_sellers",
+    "reject_sellers",
+    "MODERATION_PAGE_SIZE",
+    "Notification",
+    "enqueue_notifications",
+    "enqueue_broadcast",
+    "claim_notifications",
+    "delete_notifications",
+    "reschedule_notification",
 ]
\ No newline at end of file
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Dict, Hashable, Iterable, Optional
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from database.models import Product, Seller
+from database.catalog import serialize_product
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Бот и веб-приложение могут работать в разных потоках одного процесса
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CatalogCache:
+    def __init__(self, max_pages: int = 512, page_ttl: float = 60, max_products: int = 20000, product_ttl: float = 300):
+        self.pages = LRUCache(maxsize=max_pages, ttl=page_ttl)
+        self.products = LRUCache(maxsize=max_products, ttl=product_ttl)
+        self.version = 0
+        self.invalidations = 0
+
+    def get_page(self, key: Hashable) -> Optional[dict]:
+        return self.pages.get(key)
+
+    def set_page(self, key: Hashable, page: dict, version: int) -> None:
+        # Страница, собранная до инвалидации, уже может быть устаревшей
+        if version != self.version:
+            return
+        self.pages.set(key, page)
+        for product in page["products"]:
+            self.products.set(product["id"], product)
+
+    async def get_products(self, session, product_ids: Iterable[int]) -> Dict[int, dict]:
+        found = {}
+        missing = []
+        for product_id in product_ids:
+            product = self.products.get(product_id)
+            if product is None:
+                missing.append(product_id)
+            else:
+                found[product_id] = product
+
+        if missing:
+            version = self.version
+            result = await session.execute(
+                select(Product, Seller)
+                .join(Seller, Product.seller_id == Seller.id)
+                .where(Product.id.in_(missing))
+            )
+            for product, seller in result.all():
+                data = serialize_product(product, seller)
+                found[product.id] = data
+                if version == self.version:
+                    self.products.set(product.id, data)
+
+        return found
+
+    def invalidate(self) -> None:
+        self.version += 1
+        self.invalidations += 1
+        self.pages.clear()
+        self.products.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "invalidations": self.invalidations,
+            "pages": self.pages.stats(),
+            "products": self.products.stats(),
+        }
+
+
+catalog_cache = CatalogCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_changes(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Product, Seller)):
+            session.info["catalog_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog_on_commit(session: Session) -> None:
+    if session.info.pop("catalog_changed", False):
+        catalog_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_catalog_changes(session: Session) -> None:
+    session.info.pop("catalog_changed", None)
@@ -0,0 +1,48 @@
+from sqlalchemy import delete
+from database.database import dialect_insert
+from database.models import CartItem, Favorite
+
+
+async def upsert_favorite(session, user_id: int, product_id: int) -> bool:
+    stmt = (
+        dialect_insert(session, Favorite)
+        .values(user_id=user_id, product_id=product_id)
+        .on_conflict_do_nothing(index_elements=[Favorite.user_id, Favorite.product_id])
+    )
+    result = await session.execute(stmt)
+    return result.rowcount > 0
+
+
+async def delete_favorite(session, user_id: int, product_id: int) -> None:
+    await session.execute(
+        delete(Favorite).where(Favorite.user_id == user_id, Favorite.product_id == product_id)
+    )
+
+
+async def upsert_cart_item(session, user_id: int, product_id: int, quantity: int = 1) -> None:
+    stmt = dialect_insert(session, CartItem).values(user_id=user_id, product_id=product_id, quantity=quantity)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CartItem.user_id, CartItem.product_id],
+        set_={"quantity": CartItem.quantity + stmt.excluded.quantity},
+    )
+    await session.execute(stmt)
+
+    # Отрицательная дельта могла обнулить позицию
+    if quantity < 0:
+        await session.execute(
+            delete(CartItem).where(
+                CartItem.user_id == user_id,
+                CartItem.product_id == product_id,
+                CartItem.quantity <= 0,
+            )
+        )
+
+
+async def delete_cart_item(session, user_id: int, product_id: int) -> None:
+    await session.execute(
+        delete(CartItem).where(CartItem.user_id == user_id, CartItem.product_id == product_id)
+    )
+
+
+async def delete_cart(session, user_id: int) -> None:
+    await session.execute(delete(CartItem).where(CartItem.user_id == user_id))
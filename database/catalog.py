@@ -0,0 +1,85 @@
+import base64
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import select, or_, and_
+from database.models import Product, Seller
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, product_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{product_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at, product_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), int(product_id)
+
+
+def build_catalog_query(
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    seller_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+):
+    query = (
+        select(Product, Seller)
+        .join(Seller, Product.seller_id == Seller.id)
+        .where(Product.is_available == True)
+    )
+
+    if seller_id is not None:
+        query = query.where(Product.seller_id == seller_id)
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+
+    if cursor:
+        created_at, product_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Product.created_at < created_at,
+                and_(Product.created_at == created_at, Product.id < product_id),
+            )
+        )
+
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+    return query.order_by(Product.created_at.desc(), Product.id.desc()).limit(limit + 1)
+
+
+def image_version(image_url: Optional[str]) -> Optional[str]:
+    # Версия в ссылке на миниатюру: новая картинка — новый URL, старый можно кешировать навсегда
+    if not image_url:
+        return None
+    return hashlib.blake2s(image_url.encode(), digest_size=6).hexdigest()
+
+
+def serialize_product(product: Product, seller: Seller) -> dict:
+    return {
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "image_url": product.image_url,
+        "image_version": image_version(product.image_url),
+        "seller_name": seller.company_name
+    }
+
+
+def build_catalog_page(rows, limit: int) -> dict:
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        last_product = page[-1][0]
+        next_cursor = encode_cursor(last_product.created_at, last_product.id)
+
+    return {
+        "products": [serialize_product(product, seller) for product, seller in page],
+        "next_cursor": next_cursor,
+    }
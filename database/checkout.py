@@ -0,0 +1,88 @@
+from typing import NamedTuple, Optional
+from sqlalchemy import delete, insert, select
+from database.database import dialect_insert
+from database.models import CartItem, Order, OrderItem, Product, User
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 64
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class CheckoutResult(NamedTuple):
+    order_id: int
+    total_amount: float
+    created: bool
+
+
+async def get_or_create_user_id(session, telegram_id: int) -> int:
+    # Пользователь WebApp мог ни разу не написать боту /start; пустой DO UPDATE нужен ради RETURNING
+    stmt = dialect_insert(session, User).values(telegram_id=telegram_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={"telegram_id": stmt.excluded.telegram_id},
+    ).returning(User.id)
+    return (await session.execute(stmt)).scalar_one()
+
+
+async def checkout_cart(session, telegram_id: int, idempotency_key: Optional[str] = None) -> CheckoutResult:
+    # Корзина превращается в заказ одной транзакцией; коммит — на стороне вызывающего
+    if idempotency_key is not None and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise CheckoutError("Слишком длинный ключ идемпотентности")
+
+    # Первая же запись берёт блокировку SQLite на запись до любых чтений, поэтому параллельные
+    # оформления не упираются в устаревший снимок WAL, а ждут друг друга
+    user_id = await get_or_create_user_id(session, telegram_id)
+
+    # Цены фиксируются тем же запросом, что читает корзину; в PostgreSQL строки корзины блокируются
+    result = await session.execute(
+        select(CartItem.product_id, CartItem.quantity, Product.price)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == telegram_id, CartItem.quantity > 0, Product.is_available == True)
+        .with_for_update(of=CartItem)
+    )
+    lines = result.all()
+    if not lines:
+        # Повторное нажатие после успешного оформления видит уже пустую корзину
+        existing = await _find_order(session, user_id, idempotency_key) if idempotency_key else None
+        if existing is None:
+            raise CheckoutError("Корзина пуста")
+        return existing
+
+    total_amount = sum(price * quantity for _, quantity, price in lines)
+
+    stmt = (
+        dialect_insert(session, Order)
+        .values(user_id=user_id, total_amount=total_amount, idempotency_key=idempotency_key)
+        .on_conflict_do_nothing(index_elements=[Order.user_id, Order.idempotency_key])
+        .returning(Order.id)
+    )
+    order_id = (await session.execute(stmt)).scalar()
+    if order_id is None:
+        # Заказ с этим ключом уже есть: корзину не трогаем
+        return await _find_order(session, user_id, idempotency_key)
+
+    await session.execute(insert(OrderItem), [
+        {"order_id": order_id, "product_id": product_id, "quantity": quantity, "price_at_order": price}
+        for product_id, quantity, price in lines
+    ])
+    # Недоступные товары остаются в корзине
+    await session.execute(
+        delete(CartItem).where(
+            CartItem.user_id == telegram_id,
+            CartItem.product_id.in_([product_id for product_id, _, _ in lines]),
+        )
+    )
+
+    return CheckoutResult(order_id, total_amount, True)
+
+
+async def _find_order(session, user_id: int, idempotency_key: str) -> Optional[CheckoutResult]:
+    row = (await session.execute(
+        select(Order.id, Order.total_amount)
+        .where(Order.user_id == user_id, Order.idempotency_key == idempotency_key)
+    )).first()
+    if row is None:
+        return None
+    return CheckoutResult(row.id, row.total_amount, False)
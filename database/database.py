@@ -1,23 +1,196 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from typing import AsyncGenerator, Optional
+import asyncio
+import logging
+import random
+import time
+import weakref
 from contextlib import asynccontextmanager
-import os
-from dotenv import load_dotenv
+from bot.config import settings
+from database.metrics import instrument_engine
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./marketplace.db")
+# Профили движка: dev — прежнее поведение с логированием SQL, production — WAL и без echo
+ENGINE_PROFILES = {
+    "dev": {
+        "echo": True,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "busy_timeout": 5000,
+    },
+    "production": {
+        "echo": False,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "busy_timeout": 5000,
+    },
+}
 
-engine = create_async_engine(DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
+
+def create_engine_from_settings(url: Optional[str] = None, profile: Optional[str] = None, read_only: bool = False) -> AsyncEngine:
+    url = make_url(url or settings.DATABASE_URL)
+    profile_name = profile or settings.DB_PROFILE
+    options = ENGINE_PROFILES[profile_name]
+    echo = options["echo"] if settings.DB_ECHO is None else settings.DB_ECHO
+
+    if url.get_backend_name() == "sqlite":
+        engine = create_async_engine(url, echo=echo, connect_args={"check_same_thread": False})
+        _install_sqlite_pragmas(engine, {**options, "query_only": read_only})
+    else:
+        engine = create_async_engine(
+            url,
+            echo=echo,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=True,
+            # Транзакции READ ONLY: случайная запись через читающий engine упадёт сразу
+            execution_options={"postgresql_readonly": True} if read_only else {},
+        )
+
+    if settings.DB_SLOW_QUERY_MS is not None:
+        _install_slow_query_log(engine, settings.DB_SLOW_QUERY_MS, settings.DB_SLOW_QUERY_SAMPLE_RATE)
+    if settings.METRICS_ENABLED:
+        instrument_engine(engine.sync_engine)
+
+    return engine
+
+
+def _install_sqlite_pragmas(engine: AsyncEngine, options: dict) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={options['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous={options['synchronous']}")
+        cursor.execute(f"PRAGMA mmap_size={int(options['mmap_size'])}")
+        cursor.execute(f"PRAGMA busy_timeout={int(options['busy_timeout'])}")
+        if options.get("query_only"):
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def _install_slow_query_log(engine: AsyncEngine, threshold_ms: float, sample_rate: float) -> None:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and random.random() < sample_rate:
+            context._query_started_at = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, "_query_started_at", None)
+        if started_at is None:
+            return
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        if elapsed_ms >= threshold_ms:
+            logger.warning("Slow query (%.1f ms): %s", elapsed_ms, statement[:500])
+
+
+engine = create_engine_from_settings()
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Чтение без требований к свежести (каталог, статистика, выгрузка) идёт в реплику. Репликой может быть
+# и тот же файл SQLite: отдельный пул только для чтения не ждёт в очереди вместе с пишущими запросами
+if settings.DATABASE_REPLICA_URL:
+    read_engine = create_engine_from_settings(settings.DATABASE_REPLICA_URL, read_only=True)
+    read_session_maker = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+else:
+    read_engine = engine
+    read_session_maker = async_session_maker
+
 
-async def get_session() -> AsyncSession:
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
 
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    async with read_session_maker() as session:
+        yield session
+
+
+async def dispose_engines() -> None:
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+
+class LazySession:
+    # Создаёт AsyncSession только при первом обращении, чтобы обработчики без БД не занимали соединение
+    def __init__(self, session_maker: async_sessionmaker = async_session_maker):
+        self._session_maker = session_maker
+        self._session: Optional[AsyncSession] = None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._session_maker()
+        return getattr(self._session, name)
+
+    @property
+    def has_writes(self) -> bool:
+        # Флаг выставляют события сессии из database.routing
+        return self._session is not None and bool(self._session.info.get("has_writes"))
+
+    async def __aenter__(self) -> "LazySession":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._session is None:
+            return
+        try:
+            if exc_type is None:
+                await self._session.commit()
+            else:
+                await self._session.rollback()
+        finally:
+            await self._session.close()
+            self._session = None
+
+
+_sqlite_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def serialized_writes(session):
+    # SQLite допускает одного писателя, а busy_timeout ждёт блокировку с нарастающими паузами
+    # и под нагрузкой морит часть транзакций голодом. Пишущие транзакции процесса выстраиваются
+    # в очередь здесь; PostgreSQL блокирует только затронутые строки и в очереди не нуждается
+    if session.bind.dialect.name != "sqlite":
+        yield
+        return
+
+    loop = asyncio.get_running_loop()
+    lock = _sqlite_write_locks.get(loop)
+    if lock is None:
+        lock = _sqlite_write_locks[loop] = asyncio.Lock()
+    async with lock:
+        yield
+
+
+def dialect_insert(session, model):
+    # INSERT с поддержкой ON CONFLICT для текущего бэкенда (SQLite или PostgreSQL)
+    if session.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
 async def init_db():
-    from database.models import Base
+    from database.migrations import LATEST_VERSION, get_schema_version, migrate
+
+    # Актуальная база проверяется одним запросом к schema_version, без рефлексии таблиц
+    async with engine.connect() as conn:
+        version = await conn.run_sync(get_schema_version)
+    if version > LATEST_VERSION:
+        # Во время выкладки старый процесс может стартовать на уже обновлённой базе
+        logger.warning("Версия схемы %d новее известной коду (%d)", version, LATEST_VERSION)
+    if version >= LATEST_VERSION:
+        return
+
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(migrate)
@@ -0,0 +1,90 @@
+import csv
+import io
+from typing import AsyncIterator, Optional
+import orjson
+from sqlalchemy import select
+from bot.config import settings
+from database.database import read_session_maker
+from database.models import Product, Seller
+
+EXPORT_COLUMNS = (
+    "id",
+    "name",
+    "description",
+    "price",
+    "image_url",
+    "is_available",
+    "seller_id",
+    "seller_name",
+    "created_at",
+)
+EXPORT_BATCH_SIZE = 1000
+
+
+def build_export_query(available_only: bool = False):
+    query = (
+        select(
+            Product.id,
+            Product.name,
+            Product.description,
+            Product.price,
+            Product.image_url,
+            Product.is_available,
+            Product.seller_id,
+            Seller.company_name,
+            Product.created_at,
+        )
+        .join(Seller, Product.seller_id == Seller.id)
+        .order_by(Product.id)
+    )
+    if available_only:
+        query = query.where(Product.is_available == True)
+    return query
+
+
+async def iter_export_batches(
+    available_only: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    session_maker=read_session_maker,
+) -> AsyncIterator[list]:
+    # Строки читаются серверным курсором пачками (с реплики, если она есть), весь каталог в памяти не держится
+    async with session_maker() as session:
+        query = build_export_query(available_only).execution_options(yield_per=batch_size)
+        result = await session.stream(query)
+        async for partition in result.partitions(batch_size):
+            yield partition
+
+
+async def iter_ndjson(available_only: bool = False, batch_size: int = EXPORT_BATCH_SIZE, **kwargs) -> AsyncIterator[bytes]:
+    dumps = orjson.dumps
+    async for rows in iter_export_batches(available_only, batch_size, **kwargs):
+        yield b"".join(dumps(dict(zip(EXPORT_COLUMNS, row))) + b"\n" for row in rows)
+
+
+async def iter_csv(available_only: bool = False, batch_size: int = EXPORT_BATCH_SIZE, **kwargs) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in iter_export_batches(available_only, batch_size, **kwargs):
+        writer.writerows(
+            (*row[:-1], row[-1].isoformat() if row[-1] is not None else "")
+            for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Каталог пуст: отдаём хотя бы заголовок
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", iter_ndjson),
+    "csv": ("text/csv; charset=utf-8", iter_csv),
+}
+
+
+def export_catalog(fmt: str, available_only: bool = False, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    _, iterator = EXPORT_FORMATS[fmt]
+    return iterator(available_only, batch_size or settings.EXPORT_BATCH_SIZE)
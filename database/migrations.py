@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, UniqueConstraint, inspect, select, text
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы — одна строка в schema_version: запуск с актуальной базой стоит одного запроса
+# вместо рефлексии всех таблиц. Базовая миграция создаёт схему по текущим моделям, поэтому
+# следующие миграции идемпотентны — на новой базе их изменения уже сделаны
+schema_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("description", String, nullable=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Ключ pg_advisory_xact_lock: процессы, стартующие одновременно, применяют миграции по очереди
+MIGRATION_LOCK_KEY = 7305417
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable
+
+
+# Дубликаты, мешающие создать уникальные индексы на базе, созданной до их появления
+DEDUPLICATE_STATEMENTS = {
+    "uq_cart_items_user_product": [
+        "UPDATE cart_items SET quantity = (SELECT SUM(c.quantity) FROM cart_items c "
+        "WHERE c.user_id = cart_items.user_id AND c.product_id = cart_items.product_id) "
+        "WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id HAVING COUNT(*) > 1)",
+        "DELETE FROM cart_items WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id)",
+    ],
+    "uq_favorites_user_product": [
+        "DELETE FROM favorites WHERE id NOT IN (SELECT MIN(id) FROM favorites GROUP BY user_id, product_id)",
+    ],
+}
+
+
+def reconcile_legacy_schema(connection) -> None:
+    # База, созданная до миграций: create_all не добавляет столбцы, индексы и ограничения в существующие таблицы
+    from database.models import Base
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns and column.nullable:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        existing.update(constraint["name"] for constraint in inspector.get_unique_constraints(table.name))
+
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+
+        for constraint in table.constraints:
+            if not isinstance(constraint, UniqueConstraint) or constraint.name in existing:
+                continue
+            for statement in DEDUPLICATE_STATEMENTS.get(constraint.name, []):
+                connection.execute(text(statement))
+            columns = ", ".join(column.name for column in constraint.columns)
+            connection.execute(text(f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})"))
+
+
+def create_model_index(connection, table_name: str, index_name: str) -> None:
+    # Индекс берётся из моделей: описание одно, на новой базе его уже создал create_all
+    from database.models import Base
+    table = Base.metadata.tables[table_name]
+    index = next(index for index in table.indexes if index.name == index_name)
+    index.create(connection, checkfirst=True)
+
+
+def drop_index(connection, index_name: str) -> None:
+    connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+
+
+def baseline(connection) -> None:
+    from database.models import Base
+    from database.search import install_search
+
+    legacy = inspect(connection).has_table("users")
+    Base.metadata.create_all(connection)
+    if legacy:
+        reconcile_legacy_schema(connection)
+    install_search(connection)
+
+
+def seller_catalog_index(connection) -> None:
+    # Каталог продавца: WHERE seller_id AND is_available ORDER BY created_at DESC, id DESC — без сортировки.
+    # Одиночный индекс по seller_id покрывается новым составным
+    create_model_index(connection, "products", "ix_products_seller_available_created_id")
+    drop_index(connection, "ix_products_seller_id")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline schema from models", baseline),
+    Migration(2, "composite index for the seller catalog", seller_catalog_index),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(connection) -> int:
+    if not connection.dialect.has_table(connection, schema_version.name):
+        return 0
+    return connection.execute(select(schema_version.c.version)).scalar() or 0
+
+
+def migrate(connection) -> int:
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+    current = get_schema_version(connection)
+    if current == 0:
+        schema_metadata.create_all(connection)
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        logger.info("Миграция схемы %d: %s", migration.version, migration.description)
+        migration.apply(connection)
+        values = {"version": migration.version, "description": migration.description, "applied_at": datetime.utcnow()}
+        if current == 0:
+            connection.execute(schema_version.insert().values(id=1, **values))
+        else:
+            connection.execute(schema_version.update().where(schema_version.c.id == 1).values(**values))
+        current = migration.version
+
+    return current
+
+
+async def main() -> None:
+    from database.database import engine
+
+    parser = argparse.ArgumentParser(description="Database schema migrations")
+    parser.add_argument("--status", action="store_true", help="only print the current and the latest version")
+    args = parser.parse_args()
+
+    async with engine.connect() as conn:
+        current = await conn.run_sync(get_schema_version)
+    print(f"schema version {current}, latest {LATEST_VERSION}")
+    if not args.status and current < LATEST_VERSION:
+        async with engine.begin() as conn:
+            current = await conn.run_sync(migrate)
+        print(f"migrated to {current}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, Date, DateTime, ForeignKey, Text, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -59,6 +59,11 @@ class Seller(Base):
     user = relationship("User", back_populates="seller")
     products = relationship("Product", back_populates="seller")
 
+    __table_args__ = (
+        # Очередь модерации: WHERE status = 'pending' ORDER BY created_at, id
+        Index("ix_sellers_status_created_id", "status", "created_at", "id"),
+    )
+
 
 class Product(Base):
     __tablename__ = "products"
@@ -77,6 +82,13 @@ class Product(Base):
     favorites = relationship("Favorite", back_populates="product")
     cart_items = relationship("CartItem", back_populates="product")
 
+    __table_args__ = (
+        # Keyset-пагинация каталога: WHERE is_available ORDER BY created_at DESC, id DESC
+        Index("ix_products_available_created_id", "is_available", "created_at", "id"),
+        # Каталог одного продавца в том же порядке; заменил одиночный индекс по seller_id
+        Index("ix_products_seller_available_created_id", "seller_id", "is_available", "created_at", "id"),
+    )
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -85,18 +97,25 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     total_amount = Column(Float, nullable=False)
     status = Column(SQLEnum(OrderStatus), default=OrderStatus.PENDING)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     confirmed_at = Column(DateTime, nullable=True)
+    # Ключ из клиента: повторное нажатие «Оформить» не создаёт второй заказ
+    idempotency_key = Column(String(64), nullable=True)
 
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
 
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_orders_user_idempotency_key"),
+        Index("ix_orders_user_created", "user_id", "created_at"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, default=1)
     price_at_order = Column(Float, nullable=False)
@@ -111,11 +130,15 @@ class Favorite(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     user = relationship("User", back_populates="favorites")
     product = relationship("Product", back_populates="favorites")
 
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_favorites_user_product"),
+    )
+
 
 class CartItem(Base):
     __tablename__ = "cart_items"
@@ -124,7 +147,71 @@ class CartItem(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, default=1)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     user = relationship("User", back_populates="cart_items")
-    product = relationship("Product", back_populates="cart_items")
\ No newline at end of file
+    product = relationship("Product", back_populates="cart_items")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_cart_items_user_product"),
+    )
+
+
+class FSMRecord(Base):
+    __tablename__ = "fsm_states"
+
+    key = Column(String, primary_key=True)
+    state = Column(String, nullable=True)
+    data = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class ProductRecommendation(Base):
+    __tablename__ = "product_recommendations"
+
+    # Топ-K соседей товара по совместным покупкам/корзинам/избранному; product_id = 0 — популярные товары
+    product_id = Column(Integer, primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    neighbor_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+
+
+class SellerSalesDaily(Base):
+    __tablename__ = "seller_sales_daily"
+
+    # Агрегаты продаж продавца по дням подтверждения заказа; ведутся инкрементально при смене статуса
+    seller_id = Column(Integer, ForeignKey("sellers.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)
+    items_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    commission = Column(Float, nullable=False, default=0.0)
+
+
+class SellerSalesTotal(Base):
+    __tablename__ = "seller_sales_totals"
+
+    seller_id = Column(Integer, ForeignKey("sellers.id"), primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)
+    items_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    commission = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    # Исходящие сообщения бота: пишутся в транзакции события и удаляются после отправки
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    failed = Column(Boolean, nullable=False, default=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_notification_outbox_due", "failed", "next_attempt_at"),
+    )
\ No newline at end of file
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import and_, case, literal, or_, select, update
+from database.models import Seller, SellerStatus, User, UserRole
+
+MODERATION_PAGE_SIZE = 5
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_moderation_cursor(created_at: datetime, seller_id: int) -> str:
+    # Компактный курсор: callback_data в Telegram ограничена 64 байтами
+    micros = (created_at - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{seller_id}"
+
+
+def decode_moderation_cursor(cursor: str) -> Tuple[datetime, int]:
+    micros, seller_id = cursor.split(".")
+    return _EPOCH + timedelta(microseconds=int(micros)), int(seller_id)
+
+
+def build_moderation_query(cursor: Optional[str] = None, limit: int = MODERATION_PAGE_SIZE):
+    # Старые заявки первыми; keyset по индексу (status, created_at, id) не сдвигается,
+    # когда рассмотренные заявки уходят из очереди
+    query = select(
+        Seller.id, Seller.company_name, Seller.iin, Seller.description, Seller.created_at
+    ).where(Seller.status == SellerStatus.PENDING)
+
+    if cursor:
+        created_at, seller_id = decode_moderation_cursor(cursor)
+        query = query.where(
+            or_(
+                Seller.created_at > created_at,
+                and_(Seller.created_at == created_at, Seller.id > seller_id),
+            )
+        )
+
+    return query.order_by(Seller.created_at, Seller.id).limit(limit + 1)
+
+
+def build_moderation_page(rows, limit: int = MODERATION_PAGE_SIZE) -> dict:
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_moderation_cursor(page[-1].created_at, page[-1].id)
+    return {"sellers": page, "next_cursor": next_cursor}
+
+
+async def approve_sellers(session, seller_ids: Sequence[int]) -> List[int]:
+    # Пачка заявок одобряется двумя UPDATE в одной транзакции; уже рассмотренные пропускаются.
+    # Возвращает telegram_id владельцев одобренных заявок. Коммит — на стороне вызывающего
+    result = await session.execute(
+        update(Seller)
+        .where(Seller.id.in_(seller_ids), Seller.status == SellerStatus.PENDING)
+        .values(status=SellerStatus.APPROVED, approved_at=datetime.utcnow())
+        .returning(Seller.user_id)
+    )
+    user_ids = result.scalars().all()
+    if not user_ids:
+        return []
+    # Core UPDATE не попадает в session.dirty: товары одобренных продавцов появятся в каталоге
+    # после коммита через тот же хук, что и для ORM-изменений (database.cache)
+    session.info["catalog_changed"] = True
+
+    # Администратор с магазином остаётся администратором
+    result = await session.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(role=case((User.role == UserRole.USER, literal(UserRole.SELLER, User.role.type)), else_=User.role))
+        .returning(User.telegram_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalars().all()
+
+
+async def reject_sellers(session, seller_ids: Sequence[int]) -> List[int]:
+    # Возвращает telegram_id владельцев отклонённых заявок
+    result = await session.execute(
+        update(Seller)
+        .where(Seller.id.in_(seller_ids), Seller.status == SellerStatus.PENDING)
+        .values(status=SellerStatus.REJECTED)
+        .returning(Seller.user_id)
+    )
+    user_ids = result.scalars().all()
+    if not user_ids:
+        return []
+
+    result = await session.execute(select(User.telegram_id).where(User.id.in_(user_ids)))
+    return result.scalars().all()
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import delete, insert, literal, select, update
+from database.models import NotificationOutbox, User
+
+
+class Notification(NamedTuple):
+    id: int
+    chat_id: int
+    text: str
+    attempts: int
+
+
+async def enqueue_notifications(session, messages: Iterable[Tuple[int, str]]) -> int:
+    # Пишется в транзакции вызывающего: уведомление уходит, только если событие закоммичено
+    rows = [{"chat_id": chat_id, "text": text} for chat_id, text in messages]
+    if rows:
+        await session.execute(insert(NotificationOutbox), rows)
+    return len(rows)
+
+
+async def enqueue_broadcast(session, text: str) -> int:
+    # Один INSERT ... SELECT по всем пользователям, без выборки их в память
+    stmt = insert(NotificationOutbox).from_select(
+        ["chat_id", "text", "next_attempt_at"],
+        select(User.telegram_id, literal(text), literal(datetime.utcnow())).where(User.telegram_id.is_not(None)),
+    )
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+async def claim_notifications(session, limit: int, lease: float) -> List[Notification]:
+    # Взятые сообщения откладываются на время аренды: если процесс упадёт, они снова станут due
+    now = datetime.utcnow()
+    due = (
+        select(NotificationOutbox.id)
+        .where(NotificationOutbox.failed == False, NotificationOutbox.next_attempt_at <= now)
+        .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(due.scalar_subquery()))
+        .values(next_attempt_at=now + timedelta(seconds=lease))
+        .returning(
+            NotificationOutbox.id,
+            NotificationOutbox.chat_id,
+            NotificationOutbox.text,
+            NotificationOutbox.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return sorted((Notification(*row) for row in result.all()), key=lambda notification: notification.id)
+
+
+async def delete_notifications(session, notification_ids: List[int]) -> None:
+    for start in range(0, len(notification_ids), 500):
+        chunk = notification_ids[start:start + 500]
+        await session.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_(chunk)))
+
+
+async def reschedule_notification(
+    session,
+    notification_id: int,
+    attempts: int,
+    delay: Optional[float],
+    error: Optional[str] = None,
+) -> None:
+    # delay=None — окончательная ошибка: строка остаётся в таблице для разбора
+    values = {"attempts": attempts, "last_error": error}
+    if delay is None:
+        values["failed"] = True
+    else:
+        values["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=delay)
+    await session.execute(
+        update(NotificationOutbox).where(NotificationOutbox.id == notification_id).values(**values)
+    )
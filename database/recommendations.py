@@ -0,0 +1,100 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import delete, insert, literal, select, union_all
+from database.models import CartItem, Favorite, Order, OrderItem, Product, ProductRecommendation, User
+
+POPULAR_KEY = 0
+MAX_SEEDS = 20
+DEFAULT_RECOMMENDATIONS = 10
+
+# Вес взаимодействия: покупка говорит о вкусе больше, чем корзина или избранное
+INTERACTION_WEIGHTS = {
+    "order": 3.0,
+    "cart": 2.0,
+    "favorite": 1.0,
+}
+
+
+def _weight(kind: str):
+    return literal(INTERACTION_WEIGHTS[kind]).label("weight")
+
+
+def build_interactions_query(since=None, user_keys: Iterable[int] = None):
+    # Пользователь везде определяется по telegram_id: так его знают корзина и избранное WebApp
+    orders = (
+        select(User.telegram_id.label("user_key"), OrderItem.product_id, Order.created_at, _weight("order"))
+        .join(Order, OrderItem.order_id == Order.id)
+        .join(User, Order.user_id == User.id)
+    )
+    carts = select(CartItem.user_id.label("user_key"), CartItem.product_id, CartItem.created_at, _weight("cart"))
+    favorites = select(Favorite.user_id.label("user_key"), Favorite.product_id, Favorite.created_at, _weight("favorite"))
+
+    if since is not None:
+        orders = orders.where(Order.created_at > since)
+        carts = carts.where(CartItem.created_at > since)
+        favorites = favorites.where(Favorite.created_at > since)
+    if user_keys is not None:
+        user_keys = list(user_keys)
+        orders = orders.where(User.telegram_id.in_(user_keys))
+        carts = carts.where(CartItem.user_id.in_(user_keys))
+        favorites = favorites.where(Favorite.user_id.in_(user_keys))
+
+    return union_all(orders, carts, favorites)
+
+
+async def replace_recommendations(session, rows: List[Tuple[int, int, int, float]], product_ids=None) -> None:
+    # product_ids=None — полная пересборка таблицы
+    if product_ids is None:
+        await session.execute(delete(ProductRecommendation))
+    else:
+        product_ids = list(product_ids)
+        for start in range(0, len(product_ids), 500):
+            chunk = product_ids[start:start + 500]
+            await session.execute(delete(ProductRecommendation).where(ProductRecommendation.product_id.in_(chunk)))
+
+    for start in range(0, len(rows), 5000):
+        await session.execute(insert(ProductRecommendation), [
+            {"product_id": product_id, "rank": rank, "neighbor_id": neighbor_id, "score": score}
+            for product_id, rank, neighbor_id, score in rows[start:start + 5000]
+        ])
+
+
+async def get_seed_products(session, telegram_id: int) -> List[int]:
+    query = build_interactions_query(user_keys=[telegram_id]).subquery()
+    result = await session.execute(
+        select(query.c.product_id).order_by(query.c.created_at.desc()).limit(MAX_SEEDS * 3)
+    )
+    seeds = []
+    for product_id in result.scalars():
+        if product_id not in seeds:
+            seeds.append(product_id)
+    return seeds[:MAX_SEEDS]
+
+
+async def score_neighbors(session, product_ids: List[int]) -> Dict[int, float]:
+    result = await session.execute(
+        select(ProductRecommendation.neighbor_id, ProductRecommendation.score)
+        .join(Product, Product.id == ProductRecommendation.neighbor_id)
+        .where(ProductRecommendation.product_id.in_(product_ids), Product.is_available == True)
+    )
+    scores: Dict[int, float] = defaultdict(float)
+    for neighbor_id, score in result.all():
+        scores[neighbor_id] += score
+    return scores
+
+
+async def get_recommended_ids(session, telegram_id: int, limit: int = DEFAULT_RECOMMENDATIONS) -> List[int]:
+    # Соседи каждого из последних товаров пользователя читаются по первичному ключу — O(K) на товар
+    seeds = await get_seed_products(session, telegram_id)
+    scores = await score_neighbors(session, seeds) if seeds else {}
+    for product_id in seeds:
+        scores.pop(product_id, None)
+
+    # Новому пользователю или без найденных соседей — популярные товары
+    if not scores:
+        scores = await score_neighbors(session, [POPULAR_KEY])
+        for product_id in seeds:
+            scores.pop(product_id, None)
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [product_id for product_id, _ in ranked[:limit]]
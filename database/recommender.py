@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import scipy.sparse as sp
+from bot.config import settings
+from database.database import async_session_maker
+from database.recommendations import POPULAR_KEY, build_interactions_query, replace_recommendations
+
+logger = logging.getLogger(__name__)
+
+# Записи, закоммиченные чуть позже своего created_at, не должны проскочить мимо водяной отметки
+WATERMARK_OVERLAP = timedelta(seconds=30)
+
+UserItems = Dict[int, Dict[int, float]]
+RecommendationRows = List[Tuple[int, int, int, float]]
+
+
+def collapse_interactions(rows) -> UserItems:
+    # Несколько взаимодействий с одним товаром считаются одним, с наибольшим весом
+    user_items: UserItems = {}
+    for user_key, product_id, _, weight in rows:
+        items = user_items.setdefault(user_key, {})
+        if weight > items.get(product_id, 0.0):
+            items[product_id] = weight
+    return user_items
+
+
+def build_user_item_matrix(user_items: UserItems, n_items: int) -> sp.csr_matrix:
+    sizes = [len(items) for items in user_items.values()]
+    user_index = np.repeat(np.arange(len(sizes)), sizes)
+    product_ids = np.fromiter((p for items in user_items.values() for p in items), dtype=np.int64, count=sum(sizes))
+    weights = np.fromiter((w for items in user_items.values() for w in items.values()), dtype=np.float64, count=sum(sizes))
+    return sp.csr_matrix((weights, (user_index, product_ids)), shape=(len(sizes), n_items))
+
+
+def top_k_neighbors(cooccurrence: sp.csr_matrix, product_ids: Iterable[int], k: int) -> RecommendationRows:
+    # Косинусная близость: C_ij / sqrt(C_ii * C_jj), C = X^T X
+    norms = np.sqrt(np.maximum(cooccurrence.diagonal(), 0.0))
+    indptr, indices, data = cooccurrence.indptr, cooccurrence.indices, cooccurrence.data
+    rows: RecommendationRows = []
+    for product_id in product_ids:
+        if product_id <= 0 or product_id >= cooccurrence.shape[0] or norms[product_id] == 0:
+            continue
+        start, end = indptr[product_id], indptr[product_id + 1]
+        neighbors, counts = indices[start:end], data[start:end]
+        mask = (neighbors != product_id) & (counts > 0)
+        neighbors, counts = neighbors[mask], counts[mask]
+        if not len(neighbors):
+            continue
+
+        scores = counts / (norms[product_id] * norms[neighbors])
+        if len(scores) > k:
+            best = np.argpartition(-scores, k)[:k]
+            neighbors, scores = neighbors[best], scores[best]
+        order = np.lexsort((neighbors, -scores))
+        rows.extend(
+            (int(product_id), rank, int(neighbors[i]), float(scores[i]))
+            for rank, i in enumerate(order)
+        )
+    return rows
+
+
+def popular_products(cooccurrence: sp.csr_matrix, k: int) -> RecommendationRows:
+    popularity = cooccurrence.diagonal()
+    candidates = np.flatnonzero(popularity > 0)
+    if not len(candidates):
+        return []
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-popularity[candidates], k)[:k]]
+    order = candidates[np.lexsort((candidates, -popularity[candidates]))]
+    top = popularity[order[0]]
+    return [(POPULAR_KEY, rank, int(product_id), float(popularity[product_id] / top)) for rank, product_id in enumerate(order)]
+
+
+class RecommendationBuilder:
+    # Матрица совместной встречаемости живёт в памяти процесса; между полными пересборками
+    # в неё вносятся только изменения пользователей с новыми взаимодействиями
+    def __init__(self, top_k: int = 20, session_maker=async_session_maker):
+        self.top_k = top_k
+        self.session_maker = session_maker
+        self.cooccurrence: Optional[sp.csr_matrix] = None
+        self.user_items: UserItems = {}
+        self.watermark = None
+
+    async def _load(self, session, since=None, user_keys: Iterable[int] = None) -> list:
+        result = await session.execute(build_interactions_query(since, user_keys))
+        return result.all()
+
+    def _advance_watermark(self, rows) -> None:
+        timestamps = [row[2] for row in rows if row[2] is not None]
+        if timestamps:
+            self.watermark = max(timestamps) if self.watermark is None else max(self.watermark, *timestamps)
+
+    async def rebuild(self) -> int:
+        started_at = time.perf_counter()
+        async with self.session_maker() as session:
+            rows = await self._load(session)
+            user_items = collapse_interactions(rows)
+            n_items = max((row[1] for row in rows), default=0) + 1
+
+            def compute():
+                matrix = build_user_item_matrix(user_items, n_items)
+                cooccurrence = (matrix.T @ matrix).tocsr()
+                product_ids = np.flatnonzero(cooccurrence.diagonal() > 0)
+                recommendations = top_k_neighbors(cooccurrence, product_ids, self.top_k)
+                return cooccurrence, recommendations + popular_products(cooccurrence, self.top_k)
+
+            # Вычисления в потоке, чтобы не блокировать обработку обновлений бота
+            cooccurrence, recommendations = await asyncio.to_thread(compute)
+            await replace_recommendations(session, recommendations)
+            await session.commit()
+
+        self.cooccurrence = cooccurrence
+        self.user_items = user_items
+        self.watermark = max((row[2] for row in rows if row[2] is not None), default=None)
+        logger.info(
+            "Рекомендации пересобраны: %d взаимодействий, %d строк за %.2f с",
+            len(rows), len(recommendations), time.perf_counter() - started_at,
+        )
+        return len(recommendations)
+
+    async def update(self) -> int:
+        if self.cooccurrence is None:
+            return await self.rebuild()
+
+        async with self.session_maker() as session:
+            since = self.watermark - WATERMARK_OVERLAP if self.watermark is not None else None
+            fresh = await self._load(session, since=since)
+            affected_users = {row[0] for row in fresh}
+            if not affected_users:
+                return 0
+
+            # Строки затронутых пользователей перечитываются целиком: так учитываются и удаления
+            rows = await self._load(session, user_keys=affected_users)
+            new_items = collapse_interactions(rows)
+            # Пользователи из перекрытия отметки, у которых ничего не изменилось, не пересчитываются
+            affected_users = {
+                user_key for user_key in affected_users
+                if new_items.get(user_key, {}) != self.user_items.get(user_key, {})
+            }
+            if not affected_users:
+                self._advance_watermark(fresh)
+                return 0
+            new_items = {user_key: new_items.get(user_key, {}) for user_key in affected_users}
+            old_items = {user_key: self.user_items.get(user_key, {}) for user_key in affected_users}
+            changed: Set[int] = set()
+            for items in (*new_items.values(), *old_items.values()):
+                changed.update(items)
+
+            n_items = max(self.cooccurrence.shape[0], max(changed, default=0) + 1)
+
+            def compute():
+                cooccurrence = self.cooccurrence.copy()
+                if n_items > cooccurrence.shape[0]:
+                    cooccurrence.resize((n_items, n_items))
+                new_matrix = build_user_item_matrix(new_items, n_items)
+                old_matrix = build_user_item_matrix(old_items, n_items)
+                cooccurrence = (cooccurrence + new_matrix.T @ new_matrix - old_matrix.T @ old_matrix).tocsr()
+                cooccurrence.eliminate_zeros()
+                # Пересчитываются только строки изменившихся товаров; остальные немного отстают
+                # в нормировке до следующей полной пересборки
+                recommendations = top_k_neighbors(cooccurrence, sorted(changed), self.top_k)
+                return cooccurrence, recommendations + popular_products(cooccurrence, self.top_k)
+
+            cooccurrence, recommendations = await asyncio.to_thread(compute)
+            await replace_recommendations(session, recommendations, product_ids=changed | {POPULAR_KEY})
+            await session.commit()
+
+        self.cooccurrence = cooccurrence
+        for user_key in affected_users:
+            if new_items.get(user_key):
+                self.user_items[user_key] = new_items[user_key]
+            else:
+                self.user_items.pop(user_key, None)
+        self._advance_watermark(fresh)
+        logger.info("Рекомендации обновлены: %d пользователей, %d товаров", len(affected_users), len(changed))
+        return len(recommendations)
+
+
+async def run_recommendations_job(
+    interval: float = None,
+    rebuild_interval: float = None,
+    top_k: int = None,
+) -> None:
+    interval = interval or settings.RECOMMENDATIONS_INTERVAL
+    rebuild_interval = rebuild_interval or settings.RECOMMENDATIONS_REBUILD_INTERVAL
+    builder = RecommendationBuilder(top_k or settings.RECOMMENDATIONS_TOP_K)
+    last_rebuild = None
+
+    while True:
+        try:
+            if last_rebuild is None or time.monotonic() - last_rebuild >= rebuild_interval:
+                await builder.rebuild()
+                last_rebuild = time.monotonic()
+            else:
+                await builder.update()
+        except Exception:
+            logger.exception("Не удалось обновить рекомендации")
+        await asyncio.sleep(interval)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Пересборка таблицы рекомендаций")
+    parser.add_argument("--top-k", type=int, default=settings.RECOMMENDATIONS_TOP_K)
+    args = parser.parse_args()
+
+    from database import init_db, engine
+    await init_db()
+    await RecommendationBuilder(args.top_k).rebuild()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
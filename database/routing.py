@@ -0,0 +1,45 @@
+from typing import Hashable, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from bot.config import settings
+from database.cache import LRUCache
+from database.database import async_session_maker, read_session_maker
+
+
+class SessionRouter:
+    # Запись и чтение своих данных сразу после записи — в основную базу, остальное чтение — в реплику.
+    # Отметки о записи живут в памяти процесса; WebApp дополнительно передаёт их через cookie
+    def __init__(self, primary, replica, stickiness: float):
+        self.primary = primary
+        self.replica = replica
+        self.stickiness = stickiness
+        # ключ пользователя -> недавно писал
+        self._recent_writers = LRUCache(maxsize=100000, ttl=stickiness)
+
+    @property
+    def replicated(self) -> bool:
+        return self.replica is not self.primary
+
+    def mark_write(self, key: Hashable) -> None:
+        if self.replicated:
+            self._recent_writers.set(key, True)
+
+    def for_read(self, key: Optional[Hashable] = None):
+        if key is not None and self._recent_writers.get(key):
+            return self.primary
+        return self.replica
+
+
+session_router = SessionRouter(async_session_maker, read_session_maker, settings.DB_READ_YOUR_WRITES_SECONDS)
+
+
+# Сессия отмечает, что писала: ORM-изменения проходят через flush, а insert/update/delete из Core — через execute
+@event.listens_for(Session, "after_flush")
+def mark_flush_write(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def mark_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy import Date, Integer, delete, func, insert, literal, select, update
+from database.database import async_session_maker, dialect_insert, serialized_writes
+from database.models import Order, OrderItem, OrderStatus, Product, Seller, SellerSalesDaily, SellerSalesTotal
+
+logger = logging.getLogger(__name__)
+
+# Заказ попадает в статистику при подтверждении и остаётся в ней после доставки
+COUNTED_STATUSES = (OrderStatus.CONFIRMED, OrderStatus.DELIVERED)
+STATS_FIELDS = ("orders_count", "items_sold", "revenue", "commission")
+STATS_BATCH_SIZE = 1000
+DEFAULT_STATS_DAYS = 7
+MAX_STATS_DAYS = 366
+
+
+def build_order_lines_query(order_id: int, sign: int = 1, day: Optional[date] = None):
+    # Вклад одного заказа в статистику каждого продавца, чьи товары в нём есть
+    revenue = func.sum(OrderItem.quantity * OrderItem.price_at_order)
+    columns = [Product.seller_id]
+    if day is not None:
+        columns.append(literal(day, Date))
+    columns += [
+        literal(sign, Integer),
+        func.sum(OrderItem.quantity) * sign,
+        revenue * sign,
+        revenue * func.coalesce(Seller.commission_rate, 0) / 100 * sign,
+    ]
+    return (
+        select(*columns)
+        .join(Product, Product.id == OrderItem.product_id)
+        .join(Seller, Seller.id == Product.seller_id)
+        .where(OrderItem.order_id == order_id)
+        .group_by(Product.seller_id, Seller.commission_rate)
+    )
+
+
+async def apply_order_to_stats(session, order_id: int, day: date, sign: int = 1) -> None:
+    # sign=-1 снимает вклад заказа; комиссия считается по текущей ставке продавца
+    stmt = dialect_insert(session, SellerSalesDaily).from_select(
+        ["seller_id", "day", *STATS_FIELDS], build_order_lines_query(order_id, sign, day)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SellerSalesDaily.seller_id, SellerSalesDaily.day],
+        set_={field: getattr(SellerSalesDaily, field) + stmt.excluded[field] for field in STATS_FIELDS},
+    )
+    await session.execute(stmt)
+
+    stmt = dialect_insert(session, SellerSalesTotal).from_select(
+        ["seller_id", *STATS_FIELDS], build_order_lines_query(order_id, sign)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SellerSalesTotal.seller_id],
+        set_={
+            **{field: getattr(SellerSalesTotal, field) + stmt.excluded[field] for field in STATS_FIELDS},
+            "updated_at": datetime.utcnow(),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def set_order_status(session, order_id: int, status: OrderStatus) -> bool:
+    # Единственный путь смены статуса заказа: статистика продавцов меняется в той же транзакции.
+    # Коммит — на стороне вызывающего
+    result = await session.execute(
+        select(Order.status, Order.confirmed_at).where(Order.id == order_id).with_for_update()
+    )
+    row = result.first()
+    if row is None or row.status == status:
+        return False
+
+    values = {"status": status}
+    confirmed_at = row.confirmed_at
+    if status in COUNTED_STATUSES and confirmed_at is None:
+        confirmed_at = values["confirmed_at"] = datetime.utcnow()
+
+    # Условие на прежний статус: параллельная смена не засчитает заказ дважды
+    result = await session.execute(
+        update(Order).where(Order.id == order_id, Order.status == row.status).values(**values)
+    )
+    if result.rowcount == 0:
+        return False
+
+    was_counted = row.status in COUNTED_STATUSES
+    is_counted = status in COUNTED_STATUSES
+    if was_counted != is_counted:
+        await apply_order_to_stats(session, order_id, confirmed_at.date(), 1 if is_counted else -1)
+    return True
+
+
+def serialize_stats(row) -> Dict[str, Any]:
+    return {
+        "orders_count": row.orders_count,
+        "items_sold": row.items_sold,
+        "revenue": round(row.revenue, 2),
+        "commission": round(row.commission, 2),
+    }
+
+
+async def get_seller_stats(session, seller_id: int, days: int = DEFAULT_STATS_DAYS) -> Dict[str, Any]:
+    # Чтение по первичным ключам: стоимость не зависит от числа заказов
+    totals = await session.get(SellerSalesTotal, seller_id)
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    result = await session.execute(
+        select(SellerSalesDaily)
+        .where(SellerSalesDaily.seller_id == seller_id, SellerSalesDaily.day >= since)
+        .order_by(SellerSalesDaily.day.desc())
+    )
+
+    return {
+        "totals": serialize_stats(totals) if totals else dict.fromkeys(STATS_FIELDS, 0),
+        "daily": [{"day": row.day.isoformat(), **serialize_stats(row)} for row in result.scalars()],
+    }
+
+
+def build_rebuild_query():
+    # Вклад каждого засчитанного заказа в статистику каждого его продавца
+    revenue = func.sum(OrderItem.quantity * OrderItem.price_at_order)
+    day = func.date(func.coalesce(Order.confirmed_at, Order.created_at), type_=Date)
+    return (
+        select(
+            Product.seller_id,
+            day,
+            func.sum(OrderItem.quantity),
+            revenue,
+            revenue * func.coalesce(Seller.commission_rate, 0) / 100,
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .join(Seller, Seller.id == Product.seller_id)
+        .where(Order.status.in_(COUNTED_STATUSES))
+        .group_by(Order.id, Product.seller_id, Seller.commission_rate)
+    )
+
+
+async def rebuild_sales_stats(batch_size: int = STATS_BATCH_SIZE, session_maker=async_session_maker) -> int:
+    # Заказы читаются серверным курсором пачками, в памяти — только агрегаты по продавцам и дням.
+    # Смены статуса, закоммиченные между чтением и заменой таблиц, будут потеряны:
+    # пересборка предназначена для начального заполнения и починки
+    daily = defaultdict(lambda: [0, 0, 0.0, 0.0])
+    totals = defaultdict(lambda: [0, 0, 0.0, 0.0])
+    lines = 0
+
+    async with session_maker() as session:
+        result = await session.stream(build_rebuild_query().execution_options(yield_per=batch_size))
+        async for partition in result.partitions(batch_size):
+            for seller_id, day, items_sold, revenue, commission in partition:
+                for stats in (daily[seller_id, day], totals[seller_id]):
+                    stats[0] += 1
+                    stats[1] += items_sold
+                    stats[2] += revenue
+                    stats[3] += commission
+            lines += len(partition)
+
+    daily_rows = [
+        {"seller_id": seller_id, "day": day, **dict(zip(STATS_FIELDS, stats))}
+        for (seller_id, day), stats in daily.items()
+    ]
+    now = datetime.utcnow()
+    totals_rows = [
+        {"seller_id": seller_id, "updated_at": now, **dict(zip(STATS_FIELDS, stats))}
+        for seller_id, stats in totals.items()
+    ]
+
+    async with session_maker() as session:
+        async with serialized_writes(session):
+            await session.execute(delete(SellerSalesDaily))
+            await session.execute(delete(SellerSalesTotal))
+            for model, rows in ((SellerSalesDaily, daily_rows), (SellerSalesTotal, totals_rows)):
+                for start in range(0, len(rows), batch_size):
+                    await session.execute(insert(model), rows[start:start + batch_size])
+            await session.commit()
+
+    logger.info(
+        "Статистика продаж пересобрана: %d строк заказов, %d продавцов, %d дней",
+        lines, len(totals_rows), len(daily_rows),
+    )
+    return lines
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Пересборка статистики продаж продавцов")
+    parser.add_argument("--batch-size", type=int, default=STATS_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from database import init_db, engine
+    await init_db()
+    await rebuild_sales_stats(args.batch_size)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
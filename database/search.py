@@ -0,0 +1,221 @@
+import re
+from typing import List, Optional
+from sqlalchemy import column, func, literal_column, select, table, text
+from database.models import Product, Seller
+from database.catalog import DEFAULT_PAGE_SIZE, serialize_product
+
+MAX_QUERY_TERMS = 8
+MIN_TERM_LENGTH = 2
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _fold(expression: str) -> str:
+    # Токенизаторы не считают ё и е одной буквой: приводим к е и в индексе, и в запросе
+    return f"replace(replace(coalesce({expression}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+_SQLITE_INDEX_PRODUCT = """
+        INSERT INTO products_fts (rowid, name, description, seller_name, seller_id)
+        SELECT new.id, {name}, {description}, {seller_name}, new.seller_id
+        WHERE new.is_available;
+""".format(
+    name=_fold("new.name"),
+    description=_fold("new.description"),
+    seller_name=_fold("(SELECT company_name FROM sellers WHERE id = new.seller_id)"),
+)
+
+# Индекс по названию, описанию и имени продавца только для товаров в продаже; id товара — rowid.
+# Сортировка и LIMIT выполняются внутри FTS-запроса, поэтому с products соединяется одна страница.
+# unicode61 приводит кириллицу к нижнему регистру; префиксные индексы (длина в символах) избавляют
+# запросы вида "товар"* от слияния списков всех слов с этим началом
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, seller_name, seller_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4 5 6'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+    %s
+    END
+    """ % _SQLITE_INDEX_PRODUCT,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF name, description, seller_id, is_available ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.id;
+    %s
+    END
+    """ % _SQLITE_INDEX_PRODUCT,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sellers_fts_update AFTER UPDATE OF company_name ON sellers BEGIN
+        UPDATE products_fts SET seller_name = %s WHERE seller_id = new.id;
+    END
+    """ % _fold("new.company_name"),
+]
+
+SQLITE_SEARCH_REBUILD = [
+    "DELETE FROM products_fts",
+    """
+    INSERT INTO products_fts (rowid, name, description, seller_name, seller_id)
+    SELECT products.id, %s, %s, %s, products.seller_id
+    FROM products LEFT JOIN sellers ON sellers.id = products.seller_id
+    WHERE products.is_available
+    """ % (_fold("products.name"), _fold("products.description"), _fold("sellers.company_name")),
+]
+
+# В PostgreSQL — отдельная таблица с tsvector и GIN-индексом. Конфигурация 'simple' без стемминга,
+# чтобы префиксный поиск по кириллице совпадал с тем, что ввёл пользователь
+POSTGRES_SEARCH_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS product_search (
+        product_id INTEGER PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_product_search_document ON product_search USING GIN (document)",
+    """
+    CREATE OR REPLACE FUNCTION product_search_document(p_name text, p_description text, p_seller_id integer)
+    RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('simple', %s), 'A')
+            || setweight(to_tsvector('simple', %s), 'B')
+            || setweight(to_tsvector('simple', %s), 'C')
+    $$ LANGUAGE sql STABLE
+    """ % (_fold("p_name"), _fold("(SELECT company_name FROM sellers WHERE id = p_seller_id)"), _fold("p_description")),
+    """
+    CREATE OR REPLACE FUNCTION product_search_sync() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO product_search (product_id, document)
+        VALUES (new.id, product_search_document(new.name, new.description, new.seller_id))
+        ON CONFLICT (product_id) DO UPDATE SET document = excluded.document;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_search_sync ON products",
+    """
+    CREATE TRIGGER products_search_sync AFTER INSERT OR UPDATE OF name, description, seller_id ON products
+    FOR EACH ROW EXECUTE FUNCTION product_search_sync()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION seller_search_sync() RETURNS trigger AS $$
+    BEGIN
+        UPDATE product_search SET document = product_search_document(p.name, p.description, p.seller_id)
+        FROM products p WHERE p.id = product_search.product_id AND p.seller_id = new.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS sellers_search_sync ON sellers",
+    """
+    CREATE TRIGGER sellers_search_sync AFTER UPDATE OF company_name ON sellers
+    FOR EACH ROW EXECUTE FUNCTION seller_search_sync()
+    """,
+]
+
+POSTGRES_SEARCH_REBUILD = [
+    """
+    INSERT INTO product_search (product_id, document)
+    SELECT id, product_search_document(name, description, seller_id) FROM products
+    ON CONFLICT (product_id) DO UPDATE SET document = excluded.document
+    """,
+]
+
+products_fts = table("products_fts", column("rowid"), column("seller_id"))
+product_search = table("product_search", column("product_id"), column("document"))
+
+
+def _search_index_exists(connection) -> bool:
+    if connection.dialect.name == "postgresql":
+        return connection.execute(text("SELECT to_regclass('product_search') IS NOT NULL")).scalar()
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+    ).first() is not None
+
+
+def install_search(connection) -> None:
+    # Вызывается из init_db после create_all; при первом создании индекс заполняется текущими товарами
+    created = not _search_index_exists(connection)
+    if connection.dialect.name == "postgresql":
+        ddl, rebuild = POSTGRES_SEARCH_DDL, POSTGRES_SEARCH_REBUILD
+    else:
+        ddl, rebuild = SQLITE_SEARCH_DDL, SQLITE_SEARCH_REBUILD
+
+    for statement in ddl:
+        connection.execute(text(statement))
+    if created:
+        for statement in rebuild:
+            connection.execute(text(statement))
+
+
+def rebuild_search(connection) -> None:
+    statements = POSTGRES_SEARCH_REBUILD if connection.dialect.name == "postgresql" else SQLITE_SEARCH_REBUILD
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def parse_search_terms(query: str) -> List[str]:
+    terms = [term.lower().replace("ё", "е") for term in _TERM_RE.findall(query) if len(term) >= MIN_TERM_LENGTH]
+    return terms[:MAX_QUERY_TERMS]
+
+
+def build_search_query(
+    dialect_name: str,
+    terms: List[str],
+    limit: int = DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    seller_id: Optional[int] = None,
+):
+    # Каждое слово ищется как префикс, все слова должны встретиться (AND)
+    if dialect_name == "postgresql":
+        ts_query = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        matches = (
+            select(
+                product_search.c.product_id.label("product_id"),
+                (-func.ts_rank_cd(product_search.c.document, ts_query)).label("score"),
+            )
+            .where(product_search.c.document.op("@@")(ts_query))
+            .subquery()
+        )
+        query = (
+            select(Product, Seller)
+            .join(matches, matches.c.product_id == Product.id)
+            .join(Seller, Product.seller_id == Seller.id)
+            .where(Product.is_available == True)
+        )
+        if seller_id is not None:
+            query = query.where(Product.seller_id == seller_id)
+        # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+        return query.order_by(matches.c.score, Product.id).limit(limit + 1).offset(offset)
+
+    match = " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    # bm25: чем меньше, тем релевантнее; совпадение в названии весит больше всего
+    score = literal_column("bm25(products_fts, 10.0, 1.0, 3.0)")
+    matches = (
+        select(products_fts.c.rowid.label("product_id"), score.label("score"))
+        .where(literal_column("products_fts").op("MATCH")(match))
+    )
+    if seller_id is not None:
+        matches = matches.where(products_fts.c.seller_id == seller_id)
+    matches = matches.order_by(score, products_fts.c.rowid).limit(limit + 1).offset(offset).subquery()
+
+    return (
+        select(Product, Seller)
+        .join(matches, matches.c.product_id == Product.id)
+        .join(Seller, Product.seller_id == Seller.id)
+        .order_by(matches.c.score, Product.id)
+    )
+
+
+def build_search_page(rows, limit: int, offset: int) -> dict:
+    page = rows[:limit]
+    return {
+        "products": [serialize_product(product, seller) for product, seller in page],
+        "next_offset": offset + limit if len(rows) > limit else None,
+    }
@@ -1,25 +1,123 @@
+import argparse
 import asyncio
+import multiprocessing
+import os
+from contextlib import suppress
 import uvicorn
-import threading
-from webapp.app import app as webapp_app
-from bot.main import main as bot_main
-from database import init_db
+from bot.config import settings
 
 
-def run_webapp():
-    uvicorn.run(webapp_app, host="0.0.0.0", port=8000)
+async def prepare_database():
+    from database import init_db, dispose_engines
+
+    await init_db()
+    # Соединения привязаны к event loop, дочерним процессам они не передаются
+    await dispose_engines()
+
+
+async def run_background_jobs():
+    # Фоновые задачи запускаются ровно в одном процессе
+    jobs = []
+    if settings.RECOMMENDATIONS_INTERVAL > 0:
+        from database.recommender import run_recommendations_job
+        jobs.append(run_recommendations_job())
+    if settings.NOTIFY_RATE > 0:
+        from bot.notifications import run_notifications_job
+        jobs.append(run_notifications_job())
+
+    if jobs:
+        await asyncio.gather(*jobs)
 
 
-async def run_all():
+async def cancel_task(task: asyncio.Task):
+    task.cancel()
+    with suppress(asyncio.CancelledError):
+        await task
+
+
+async def run_single(host: str, port: int):
+    from webapp.app import app as webapp_app
+    from bot.main import start_polling
+    from database import init_db
+
     await init_db()
 
-    # Запуск webapp в отдельном потоке
-    web_thread = threading.Thread(target=run_webapp, daemon=True)
-    web_thread.start()
+    # Бот и webapp работают задачами одного event loop и делят один engine
+    server = uvicorn.Server(uvicorn.Config(webapp_app, host=host, port=port))
+    jobs_task = asyncio.create_task(run_background_jobs())
+    if settings.BOT_MODE == "webhook":
+        # Обновления приходят в webapp, отдельный polling не нужен
+        try:
+            await server.serve()
+        finally:
+            await cancel_task(jobs_task)
+        return
+
+    bot_task = asyncio.create_task(start_polling(handle_signals=False))
+    try:
+        await server.serve()
+    finally:
+        await cancel_task(bot_task)
+        await cancel_task(jobs_task)
+
+
+async def run_bot_with_jobs():
+    from bot.main import start_polling
+
+    jobs_task = asyncio.create_task(run_background_jobs())
+    try:
+        await start_polling()
+    finally:
+        await cancel_task(jobs_task)
+
+
+def run_bot_process():
+    with suppress(KeyboardInterrupt):
+        asyncio.run(run_bot_with_jobs())
+
+
+def run_jobs_process():
+    with suppress(KeyboardInterrupt):
+        asyncio.run(run_background_jobs())
+
+
+def run_multiprocess(host: str, port: int, workers: int):
+    asyncio.run(prepare_database())
+    # Дочерние процессы читают настройки из окружения заново: режим и число воркеров из аргументов
+    # нужны им, например, чтобы хранилище FSM отключило кеш процесса (bot.main.create_storage)
+    os.environ["RUN_MODE"] = "multiprocess"
+    os.environ["WEB_WORKERS"] = str(workers)
+
+    # spawn: каждый процесс импортирует модули заново и создаёт собственный engine.
+    # В режиме webhook бот живёт в воркерах uvicorn, а фоновым задачам нужен свой процесс.
+    # Кеши каталога у каждого процесса свои: изменения из бота и других воркеров видны в WebApp
+    # после TTL страниц (ETag каталога считается по содержимому, см. webapp.app.load_catalog_body)
+    context = multiprocessing.get_context("spawn")
+    if settings.BOT_MODE == "webhook":
+        process = context.Process(target=run_jobs_process, name="jobs")
+    else:
+        process = context.Process(target=run_bot_process, name="bot")
+    process.start()
+    try:
+        uvicorn.run("webapp.app:app", host=host, port=port, workers=workers)
+    finally:
+        process.terminate()
+        process.join()
+
 
-    # Запуск бота в основном event loop
-    await bot_main()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Запуск бота и WebApp")
+    parser.add_argument("--mode", choices=["single", "multiprocess"], default=settings.RUN_MODE)
+    parser.add_argument("--host", default=settings.WEB_HOST)
+    parser.add_argument("--port", type=int, default=settings.WEB_PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS)
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(run_all())
\ No newline at end of file
+    args = parse_args()
+    if args.mode == "multiprocess":
+        run_multiprocess(args.host, args.port, args.workers)
+    else:
+        with suppress(KeyboardInterrupt):
+            asyncio.run(run_single(args.host, args.port))
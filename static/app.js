@@ -1,36 +1,183 @@
 const tg = window.Telegram.WebApp;
 const user_id = tg.initDataUnsafe.user?.id || 123456;
 
+const MUTATION_DELAY = 400;
+const SEARCH_DELAY = 300;
+
 let products = [];
+let nextCursor = null;
 let favorites = [];
 let cart = [];
 
+// Поиск: пока он активен, страница каталога хранится в catalogSnapshot
+let searchQuery = '';
+let searchOffset = null;
+let searchTimer = null;
+let catalogSnapshot = null;
+
+// ETag последних ответов сервера для условных запросов
+const etags = {};
+
+// Изменения, ещё не отправленные на сервер
+const pendingCart = new Map();
+const pendingFavorites = new Map();
+let flushTimer = null;
+let flushing = Promise.resolve();
+
 document.addEventListener('DOMContentLoaded', async () => {
     tg.expand();
-    await loadCatalog();
-    await loadFavorites();
-    await loadCart();
+    await Promise.all([loadCatalog(), loadFavorites(), loadCart()]);
+});
+
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+        flushMutations();
+    } else {
+        loadFavorites();
+        loadCart();
+    }
 });
 
+window.addEventListener('pagehide', () => flushMutations());
+
+async function fetchRevalidated(url, key) {
+    const headers = etags[key] ? { 'If-None-Match': etags[key] } : {};
+    const response = await fetch(url, { headers });
+    if (response.status === 304) return null;
+    if (!response.ok) throw new Error(`${url}: ${response.status}`);
+    etags[key] = response.headers.get('ETag');
+    return response.json();
+}
+
+function readBootstrapCatalog() {
+    // Первая страница, встроенная сервером в HTML
+    const element = document.getElementById('catalog-bootstrap');
+    if (!element) return null;
+    return { etag: element.dataset.etag || null, data: JSON.parse(element.textContent) };
+}
+
 async function loadCatalog() {
-    const response = await fetch('/catalog');
+    const bootstrap = readBootstrapCatalog();
+    if (bootstrap) {
+        if (bootstrap.etag) etags.catalog = bootstrap.etag;
+        products = bootstrap.data.products;
+        nextCursor = bootstrap.data.next_cursor;
+        renderProducts(products, 'products-grid');
+        updateLoadMore();
+        return;
+    }
+
+    const data = await fetchRevalidated('/catalog', 'catalog');
+    if (data === null) return;
+
+    if (searchQuery) {
+        catalogSnapshot = { products: data.products, nextCursor: data.next_cursor };
+        return;
+    }
+    products = data.products;
+    nextCursor = data.next_cursor;
+    renderProducts(products, 'products-grid');
+    updateLoadMore();
+}
+
+async function loadMoreProducts() {
+    if (searchQuery) {
+        await loadMoreSearchResults();
+        return;
+    }
+    if (!nextCursor) return;
+    const response = await fetch(`/catalog?cursor=${encodeURIComponent(nextCursor)}`);
     const data = await response.json();
+    products = products.concat(data.products);
+    nextCursor = data.next_cursor;
+    renderProducts(products, 'products-grid');
+    updateLoadMore();
+}
+
+function updateLoadMore() {
+    const hasMore = searchQuery ? searchOffset !== null : nextCursor;
+    document.getElementById('load-more').style.display = hasMore ? 'block' : 'none';
+}
+
+function onSearchInput(value) {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => searchProducts(value.trim()), SEARCH_DELAY);
+}
+
+async function searchProducts(query) {
+    if (!query) {
+        if (catalogSnapshot) {
+            products = catalogSnapshot.products;
+            nextCursor = catalogSnapshot.nextCursor;
+            catalogSnapshot = null;
+        }
+        searchQuery = '';
+        renderProducts(products, 'products-grid');
+        updateLoadMore();
+        return;
+    }
+
+    if (!catalogSnapshot) catalogSnapshot = { products, nextCursor };
+    searchQuery = query;
+    const response = await fetch(`/search?q=${encodeURIComponent(query)}`);
+    const data = await response.json();
+    // Пока шёл запрос, пользователь мог изменить строку поиска
+    if (query !== searchQuery) return;
+
     products = data.products;
+    searchOffset = data.next_offset;
     renderProducts(products, 'products-grid');
+    updateLoadMore();
 }
 
-async function loadFavorites() {
-    const response = await fetch(`/favorites/${user_id}`);
+async function loadMoreSearchResults() {
+    if (searchOffset === null) return;
+    const query = searchQuery;
+    const response = await fetch(`/search?q=${encodeURIComponent(query)}&offset=${searchOffset}`);
     const data = await response.json();
+    if (query !== searchQuery) return;
+
+    products = products.concat(data.products);
+    searchOffset = data.next_offset;
+    renderProducts(products, 'products-grid');
+    updateLoadMore();
+}
+
+function hasPendingMutations() {
+    return pendingCart.size > 0 || pendingFavorites.size > 0;
+}
+
+async function loadFavorites(force = false) {
+    if (!force) {
+        await flushing;
+        // Не перетирать оптимистичное состояние до отправки изменений
+        if (hasPendingMutations()) return;
+    }
+
+    const data = await fetchRevalidated(`/favorites/${user_id}`, 'favorites');
+    if (data === null) return;
     favorites = data.favorites;
     renderProducts(favorites, 'favorites-grid', true);
+    renderProducts(products, 'products-grid');
 }
 
-async function loadCart() {
-    const response = await fetch(`/cart/${user_id}`);
-    const data = await response.json();
+async function loadCart(force = false) {
+    if (!force) {
+        await flushing;
+        if (hasPendingMutations()) return;
+    }
+
+    const data = await fetchRevalidated(`/cart/${user_id}`, 'cart');
+    if (data === null) return;
     cart = data.cart;
-    renderCart(data.total);
+    renderCart();
+}
+
+// Миниатюра с сервера вместо исходной картинки продавца; версия в ссылке позволяет кешировать её навсегда
+function productImage(product) {
+    if (!product.image_version) return '📦';
+    const src = size => `/img/${product.id}/${size}?v=${product.image_version}`;
+    return `<img src="${src(320)}" srcset="${src(160)} 160w, ${src(320)} 320w, ${src(640)} 640w" sizes="50vw" loading="lazy" decoding="async" alt="">`;
 }
 
 function renderProducts(productsList, containerId, isFavorites = false) {
@@ -41,7 +188,7 @@ function renderProducts(productsList, containerId, isFavorites = false) {
         container.innerHTML = `
             <div class="empty-state">
                 <div class="empty-state-icon">${isFavorites ? '⭐' : '📦'}</div>
-                <p>${isFavorites ? 'В избранном пока пусто' : 'Каталог пуст'}</p>
+                <p>${isFavorites ? 'В избранном пока пусто' : (searchQuery ? 'Ничего не найдено' : 'Каталог пуст')}</p>
             </div>
         `;
         return;
@@ -52,7 +199,7 @@ function renderProducts(productsList, containerId, isFavorites = false) {
         const card = document.createElement('div');
         card.className = 'product-card';
         card.innerHTML = `
-            <div class="product-image">📦</div>
+            <div class="product-image">${productImage(product)}</div>
             <div class="product-name">${product.name}</div>
             <div class="product-price">${product.price} ₸</div>
             <div class="product-seller">${product.seller_name}</div>
@@ -67,7 +214,7 @@ function renderProducts(productsList, containerId, isFavorites = false) {
     });
 }
 
-function renderCart(total) {
+function renderCart() {
     const container = document.getElementById('cart-items');
     container.innerHTML = '';
 
@@ -100,57 +247,111 @@ function renderCart(total) {
         container.appendChild(cartItem);
     });
 
-    document.getElementById('total-price').textContent = total;
+    document.getElementById('total-price').textContent = cart.reduce((sum, item) => sum + item.total, 0);
+}
+
+function queueMutation() {
+    clearTimeout(flushTimer);
+    flushTimer = setTimeout(flushMutations, MUTATION_DELAY);
 }
 
-async function addToCart(productId) {
-    await fetch('/cart/add', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id, product_id: productId, quantity: 1 })
+function flushMutations() {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+
+    const operations = [];
+    pendingCart.forEach((change, productId) => {
+        if (change.remove) operations.push({ op: 'cart_remove', product_id: productId });
+        if (change.quantity !== 0) operations.push({ op: 'cart_add', product_id: productId, quantity: change.quantity });
     });
-    await loadCart();
+    pendingFavorites.forEach((op, productId) => operations.push({ op, product_id: productId }));
+
+    pendingCart.clear();
+    pendingFavorites.clear();
+    if (operations.length === 0) return flushing;
+
+    flushing = flushing.then(() => sendBatch(operations));
+    return flushing;
+}
+
+async function sendBatch(operations) {
+    try {
+        const response = await fetch('/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ user_id, operations }),
+            keepalive: true
+        });
+        if (!response.ok) throw new Error(`/batch: ${response.status}`);
+    } catch (e) {
+        // Оптимистичные изменения не применились: берём состояние сервера
+        delete etags.cart;
+        delete etags.favorites;
+        await Promise.all([loadCart(true), loadFavorites(true)]);
+    }
+}
+
+function changeCartItem(productId, delta) {
+    let item = cart.find(i => i.id === productId);
+    if (!item) {
+        const product = products.find(p => p.id === productId) || favorites.find(p => p.id === productId);
+        if (!product) return;
+        item = { id: productId, name: product.name, price: product.price, quantity: 0, total: 0 };
+        cart.push(item);
+    }
+    item.quantity += delta;
+    item.total = item.price * item.quantity;
+
+    // В очередь — только изменение, уже показанное в локальной корзине
+    const change = pendingCart.get(productId) || { remove: false, quantity: 0 };
+    change.quantity += delta;
+    pendingCart.set(productId, change);
+
+    renderCart();
+    queueMutation();
+}
+
+function addToCart(productId) {
+    changeCartItem(productId, 1);
     tg.showPopup({ title: 'Успешно', message: 'Товар добавлен в корзину' });
 }
 
-async function removeFromCart(productId) {
-    await fetch('/cart/remove', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id, product_id: productId })
-    });
-    await loadCart();
+function removeFromCart(productId) {
+    // Удаление отменяет ещё не отправленные изменения количества
+    pendingCart.set(productId, { remove: true, quantity: 0 });
+    cart = cart.filter(i => i.id !== productId);
+    renderCart();
+    queueMutation();
 }
 
-async function updateCart(productId, delta) {
+function updateCart(productId, delta) {
     const item = cart.find(i => i.id === productId);
     if (item) {
         const newQuantity = item.quantity + delta;
         if (newQuantity <= 0) {
-            await removeFromCart(productId);
+            removeFromCart(productId);
         } else {
-            await fetch('/cart/add', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ user_id, product_id: productId, quantity: delta })
-            });
-            await loadCart();
+            changeCartItem(productId, delta);
         }
     }
 }
 
-async function toggleFavorite(productId) {
+function toggleFavorite(productId) {
     const isFavorite = favorites.some(f => f.id === productId);
-    const endpoint = isFavorite ? '/favorites/remove' : '/favorites/add';
 
-    await fetch(endpoint, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id, product_id: productId })
-    });
+    if (isFavorite) {
+        favorites = favorites.filter(f => f.id !== productId);
+        pendingFavorites.set(productId, 'favorite_remove');
+    } else {
+        const product = products.find(p => p.id === productId);
+        if (!product) return;
+        favorites.push(product);
+        pendingFavorites.set(productId, 'favorite_add');
+    }
 
-    await loadFavorites();
-    await loadCatalog();
+    renderProducts(favorites, 'favorites-grid', true);
+    renderProducts(products, 'products-grid');
+    queueMutation();
 }
 
 function showSection(sectionId) {
@@ -165,20 +366,43 @@ function showSection(sectionId) {
     event.target.classList.add('active');
 }
 
-function checkout() {
+// Один ключ на попытку оформления: повторные нажатия и ретраи не создают второй заказ
+let checkoutKey = null;
+let checkoutInFlight = false;
+
+async function checkout() {
     if (cart.length === 0) {
         tg.showPopup({ title: 'Ошибка', message: 'Корзина пуста' });
         return;
     }
+    if (checkoutInFlight) return;
 
-    tg.showPopup({
-        title: 'Заказ оформлен',
-        message: 'Спасибо за покупку! Ваш заказ скоро будет обработан.'
-    });
+    checkoutInFlight = true;
+    checkoutKey = checkoutKey || crypto.randomUUID();
+    try {
+        // Сервер оформляет то, что лежит в корзине в БД, поэтому сначала отправляем изменения
+        await flushMutations();
+        const response = await fetch('/checkout', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Idempotency-Key': checkoutKey },
+            body: JSON.stringify({ user_id })
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            tg.showPopup({ title: 'Ошибка', message: data.detail || 'Не удалось оформить заказ' });
+            return;
+        }
 
-    fetch('/cart/clear', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id })
-    }).then(() => loadCart());
-}
\ No newline at end of file
+        checkoutKey = null;
+        tg.showPopup({
+            title: 'Заказ оформлен',
+            message: `Заказ №${data.order_id} на ${data.total} ₸. Спасибо за покупку! Ваш заказ скоро будет обработан.`
+        });
+        delete etags.cart;
+        await loadCart(true);
+    } catch (e) {
+        tg.showPopup({ title: 'Ошибка', message: 'Нет связи с сервером, попробуйте ещё раз' });
+    } finally {
+        checkoutInFlight = false;
+    }
+}
@@ -0,0 +1,6 @@
+import os
+
+# Настройки читаются при импорте bot.config: тестам хватает фиктивных значений
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ.setdefault("WEBAPP_URL", "http://localhost")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
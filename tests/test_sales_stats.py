@@ -0,0 +1,57 @@
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from database.database import create_engine_from_settings
+from database.models import Base, Order, OrderItem, OrderStatus, Product, Seller, SellerSalesDaily, SellerSalesTotal, User
+from database.sales_stats import STATS_FIELDS, set_order_status
+
+
+async def create_order(session) -> tuple:
+    user = User(telegram_id=1)
+    seller_user = User(telegram_id=2)
+    session.add_all([user, seller_user])
+    await session.flush()
+    seller = Seller(user_id=seller_user.id, company_name="Shop", commission_rate=10.0)
+    session.add(seller)
+    await session.flush()
+    product = Product(seller_id=seller.id, name="Book", price=100.0)
+    session.add(product)
+    await session.flush()
+    order = Order(user_id=user.id, total_amount=300.0)
+    session.add(order)
+    await session.flush()
+    session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=3, price_at_order=100.0))
+    await session.commit()
+    return seller.id, order.id
+
+
+async def read_stats(session, seller_id: int, order_id: int) -> tuple:
+    # Агрегаты пишутся Core-запросами мимо identity map: читаем заново из базы
+    confirmed_at = (await session.execute(select(Order.confirmed_at).where(Order.id == order_id))).scalar()
+    totals = await session.get(SellerSalesTotal, seller_id, populate_existing=True)
+    daily = await session.get(SellerSalesDaily, (seller_id, confirmed_at.date()), populate_existing=True)
+    return {field: getattr(totals, field) for field in STATS_FIELDS}, daily.orders_count
+
+
+async def confirm_then_cancel(db_path: str) -> list:
+    engine = create_engine_from_settings(f"sqlite+aiosqlite:///{db_path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    snapshots = []
+    async with session_maker() as session:
+        seller_id, order_id = await create_order(session)
+        for status in (OrderStatus.CONFIRMED, OrderStatus.CANCELLED):
+            assert await set_order_status(session, order_id, status)
+            await session.commit()
+            snapshots.append(await read_stats(session, seller_id, order_id))
+    await engine.dispose()
+    return snapshots
+
+
+def test_confirm_then_cancel_returns_totals_to_zero(tmp_path):
+    confirmed, cancelled = asyncio.run(confirm_then_cancel(str(tmp_path / "stats.db")))
+
+    assert confirmed == ({"orders_count": 1, "items_sold": 3, "revenue": 300.0, "commission": 30.0}, 1)
+    assert cancelled == (dict.fromkeys(STATS_FIELDS, 0), 0)
@@ -1,184 +1,533 @@
-from fastapi import FastAPI, Request, Depends
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Depends, Query, HTTPException
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_session, Product, Seller, User, Favorite, CartItem
+from database import get_session, get_read_session, session_router, User, Seller, Favorite, CartItem
+from database import get_recommended_ids, checkout_cart, CheckoutError, serialized_writes
+from database import upsert_favorite, delete_favorite, upsert_cart_item, delete_cart_item, delete_cart
+from database import EXPORT_FORMATS, export_catalog, build_search_query, build_search_page, parse_search_terms, image_version
+from database import build_catalog_query, build_catalog_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, catalog_cache, LRUCache
+from database.metrics import registry as metrics_registry
+from database.sales_stats import DEFAULT_STATS_DAYS, MAX_STATS_DAYS, get_seller_stats
+from webapp.metrics import MetricsMiddleware
+from webapp.compression import EncodedBody, PrecompressedStaticFiles, etag_matches, not_modified, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+from webapp.images import THUMBNAIL_FORMATS, THUMBNAIL_SIZES, ImageSourceError, image_proxy
 from sqlalchemy import select
+from typing import AsyncGenerator, Optional, Tuple
 from bot.config import settings
+from bot.webhook import telegram_webhook
+from contextlib import asynccontextmanager
+from markupsafe import Markup
+import hashlib
+import hmac
+import json
+import math
 import os
 
-app = FastAPI(title="Marketplace WebApp")
 
-templates = Jinja2Templates(directory="templates")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if telegram_webhook.enabled:
+        await telegram_webhook.start()
+    yield
+    if telegram_webhook.enabled:
+        await telegram_webhook.stop()
+    await image_proxy.stop()
+
+
+app = FastAPI(title="Marketplace WebApp", lifespan=lifespan)
+# Ответы /catalog и статика сжимаются заранее, middleware нужен для остальных JSON-ответов
+app.add_middleware(GZipMiddleware, minimum_size=500)
+if settings.METRICS_ENABLED:
+    # Добавлен последним — внешний слой: в задержку входит и сжатие
+    app.add_middleware(MetricsMiddleware)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+static_files = PrecompressedStaticFiles(directory="static")
+app.mount("/static", static_files, name="static")
+
+templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_files.url
+# Шаблон компилируется один раз при старте, без проверки mtime на каждый запрос
+templates.env.auto_reload = False
+index_template = templates.get_template("index.html")
+# Версия разметки главной: шаблон и хеши статики. Входит в ETag, чтобы после деплоя клиент не получил 304 со старыми ссылками
+with open(index_template.filename, "rb") as f:
+    index_fingerprint = hashlib.blake2s(f.read(), digest_size=4)
+for asset_path in sorted(static_files.assets):
+    index_fingerprint.update(static_files.assets[asset_path].hash.encode())
+INDEX_VERSION = index_fingerprint.hexdigest()
+
+# Готовые (в т.ч. сжатые) тела ответов каталога: ключ страницы -> (версия кеша, ETag, тело).
+# TTL как у страниц: запись из другого процесса (бот, другой воркер, прямой INSERT) видна не позже чем через него
+catalog_responses = LRUCache(maxsize=512, ttl=catalog_cache.pages.ttl)
+# Главная страница по ETag встроенного каталога: ETag считается по содержимому, поэтому TTL не нужен
+index_responses = LRUCache(maxsize=64)
+
+FIRST_PAGE_KEY = (None, DEFAULT_PAGE_SIZE, None, None, None)
+
+
+def inline_json(body: bytes) -> Markup:
+    # JSON внутри <script> не должен закрывать тег
+    text = body.decode().replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+    return Markup(text)
+
+
+def content_etag(body: bytes) -> str:
+    # Слабый: одно и то же содержимое отдаётся в разных Content-Encoding
+    return f'W/"{hashlib.blake2s(body, digest_size=8).hexdigest()}"'
+
+
+async def load_catalog_body(session: AsyncSession, cache_key: tuple) -> Tuple[str, EncodedBody]:
+    entry = catalog_responses.get(cache_key)
+    if entry is not None and entry[0] == catalog_cache.version:
+        return entry[1], entry[2]
+
+    cursor, limit, seller_id, min_price, max_price = cache_key
+    version = catalog_cache.version
+    page = catalog_cache.get_page(cache_key)
+    if page is None:
+        query = build_catalog_query(limit, cursor, seller_id, min_price, max_price)
+        result = await session.execute(query)
+        page = build_catalog_page(result.all(), limit)
+        catalog_cache.set_page(cache_key, page, version)
+
+    content = json.dumps(page, ensure_ascii=False, separators=(",", ":")).encode()
+    etag = content_etag(content)
+    body = EncodedBody(content, media_type="application/json")
+    # Каталог изменился во время запроса: ответ верен по содержимому, но в кеш не попадает
+    if version == catalog_cache.version:
+        catalog_responses.set(cache_key, (version, etag, body))
+    return etag, body
 
 
 @app.get("/", response_class=HTMLResponse)
-async def webapp_main(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+async def webapp_main(request: Request, session: AsyncSession = Depends(get_read_session)):
+    # Первая страница каталога встраивается в HTML, чтобы товары появились без второго запроса
+    catalog_etag, catalog_body = await load_catalog_body(session, FIRST_PAGE_KEY)
+    etag = catalog_etag[:-1] + f'-{INDEX_VERSION}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, REVALIDATE_CACHE_CONTROL)
+
+    body = index_responses.get(etag)
+    if body is None:
+        html = index_template.render(
+            request=request,
+            catalog_bootstrap=inline_json(catalog_body.variants[None]),
+            catalog_etag=catalog_etag,
+        )
+        body = EncodedBody(html.encode(), media_type="text/html; charset=utf-8")
+        index_responses.set(etag, body)
+
+    return body.response(request, etag)
 
 
 @app.get("/catalog")
-async def get_catalog(request: Request, session: AsyncSession = Depends(get_session)):
+async def get_catalog(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    seller_id: Optional[int] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    session: AsyncSession = Depends(get_read_session)
+):
+    # If-None-Match проверяется по ETag из кеша или заново прочитанной страницы, а не по версии процесса
+    cache_key = (cursor, limit, seller_id, min_price, max_price)
+    try:
+        etag, body = await load_catalog_body(session, cache_key)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return body.response(request, etag)
+
+
+@app.get("/search")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=10000),
+    seller_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    terms = parse_search_terms(q)
+    if not terms:
+        return {"products": [], "next_offset": None}
+
+    # Результаты поиска живут в том же кеше, что и страницы каталога, и сбрасываются вместе с ним
+    cache_key = ("search", tuple(terms), limit, offset, seller_id)
+    page = catalog_cache.get_page(cache_key)
+    if page is None:
+        version = catalog_cache.version
+        query = build_search_query(session.bind.dialect.name, terms, limit, offset, seller_id)
+        result = await session.execute(query)
+        page = build_search_page(result.all(), limit, offset)
+        catalog_cache.set_page(cache_key, page, version)
+
+    return page
+
+
+@app.get("/recommendations/{telegram_id}")
+async def get_recommendations(
+    telegram_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    session: AsyncSession = Depends(get_read_session)
+):
+    product_ids = await get_recommended_ids(session, telegram_id, limit)
+    products = await catalog_cache.get_products(session, product_ids)
+
+    return {"recommendations": [products[product_id] for product_id in product_ids if product_id in products]}
+
+
+@app.get("/sellers/{telegram_id}/stats")
+async def get_sales_stats(
+    telegram_id: int,
+    days: int = Query(DEFAULT_STATS_DAYS, ge=1, le=MAX_STATS_DAYS),
+    session: AsyncSession = Depends(get_read_session)
+):
     result = await session.execute(
-        select(Product, Seller)
-        .join(Seller, Product.seller_id == Seller.id)
-        .where(Product.is_available == True)
-        .order_by(Product.created_at.desc())
+        select(Seller.id).join(User, User.id == Seller.user_id).where(User.telegram_id == telegram_id)
+    )
+    seller_id = result.scalar()
+    if seller_id is None:
+        raise HTTPException(status_code=404, detail="Seller not found")
+
+    return await get_seller_stats(session, seller_id, days)
+
+
+@app.get("/export/catalog")
+async def export_catalog_stream(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    available_only: bool = False,
+):
+    if not settings.EXPORT_TOKEN:
+        raise HTTPException(status_code=404)
+    token = request.headers.get("authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(token.encode(), settings.EXPORT_TOKEN.encode()):
+        raise HTTPException(status_code=403)
+
+    media_type, _ = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export_catalog(format, available_only),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="catalog.{format}"'},
     )
 
-    products = []
-    for product, seller in result.all():
-        products.append({
-            "id": product.id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "image_url": product.image_url,
-            "seller_name": seller.company_name
-        })
 
-    return {"products": products}
+@app.get("/img/{product_id}/{size}")
+async def get_product_image(
+    request: Request,
+    product_id: int,
+    size: int,
+    v: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=404, detail="Unknown thumbnail size")
+
+    products = await catalog_cache.get_products(session, [product_id])
+    product = products.get(product_id)
+    if product is None or not product["image_url"]:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    image_format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    try:
+        name, body = await image_proxy.thumbnail(product["image_url"], size, image_format)
+    except ImageSourceError:
+        raise HTTPException(status_code=404, detail="Image not available")
+
+    # Долгий кеш только для ссылок с актуальной версией картинки, как у статики
+    if v == image_version(product["image_url"]):
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = REVALIDATE_CACHE_CONTROL
+    etag = f'"{name}"'
+    # identity — чтобы GZipMiddleware не пережимал уже сжатую картинку
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept", "Content-Encoding": "identity"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=THUMBNAIL_FORMATS[image_format][1], headers=headers)
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return {**catalog_cache.stats(), "images": image_proxy.stats()}
+
+
+@app.post(settings.WEBHOOK_PATH, include_in_schema=False)
+async def telegram_webhook_update(request: Request):
+    if not telegram_webhook.enabled:
+        raise HTTPException(status_code=404)
+    if not telegram_webhook.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token")):
+        raise HTTPException(status_code=403)
+
+    # Очередь переполнена: Telegram повторит доставку позже
+    if not telegram_webhook.feed(await request.json()):
+        return Response(status_code=503, headers={"Retry-After": "1"})
+
+    return Response(status_code=200)
+
+
+@app.get("/telegram/stats")
+async def get_webhook_stats():
+    return telegram_webhook.stats()
+
+
+def collect_runtime_stats():
+    for name in ("pages", "products"):
+        stats = getattr(catalog_cache, name).stats()
+        yield f"catalog_cache_{name}_hits_total", "counter", f"Catalog cache {name} hits", stats["hits"]
+        yield f"catalog_cache_{name}_misses_total", "counter", f"Catalog cache {name} misses", stats["misses"]
+        yield f"catalog_cache_{name}_size", "gauge", f"Catalog cache {name} entries", stats["size"]
+
+    images = image_proxy.stats()
+    yield "image_cache_hits_total", "counter", "Thumbnails served from the disk cache", images["hits"]
+    yield "image_cache_misses_total", "counter", "Thumbnail disk cache misses", images["misses"]
+    yield "image_cache_bytes", "gauge", "Size of the thumbnail disk cache", images["bytes"]
+    yield "image_thumbnails_rendered_total", "counter", "Thumbnails generated", images["rendered"]
+
+    webhook = telegram_webhook.stats()
+    if webhook:
+        yield "telegram_updates_pending", "gauge", "Webhook updates queued or in progress", webhook["pending"]
+        yield "telegram_updates_rejected_total", "counter", "Webhook updates rejected with 503", webhook["rejected"]
+
+
+metrics_registry.add_collector(collect_runtime_stats)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404)
+    # Метрики процесса: при WEB_WORKERS > 1 каждый воркер отдаёт свои
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def revalidated_json(request: Request, data: dict) -> Response:
+    # ETag по содержимому: клиент перепроверяет корзину и избранное без повторной загрузки
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    etag = f'W/"{hashlib.blake2s(body, digest_size=8).hexdigest()}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, REVALIDATE_CACHE_CONTROL)
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL})
+
+
+# Cookie с отметкой о недавней записи: следующий запрос может прийти в другой воркер,
+# где in-process отметки нет, а реплика ещё не догнала основную базу
+RECENT_WRITE_COOKIE = "recent_write"
+
+
+async def get_user_read_session(request: Request, telegram_id: int) -> AsyncGenerator[AsyncSession, None]:
+    # Корзина и избранное сразу после изменения читаются из основной базы, иначе — из реплики
+    if request.cookies.get(RECENT_WRITE_COOKIE) == str(telegram_id):
+        session_maker = session_router.primary
+    else:
+        session_maker = session_router.for_read(telegram_id)
+    async with session_maker() as session:
+        yield session
+
+
+def remember_write(response: Response, user_id) -> None:
+    if user_id is None or not session_router.replicated:
+        return
+    session_router.mark_write(user_id)
+    response.set_cookie(
+        RECENT_WRITE_COOKIE,
+        str(user_id),
+        max_age=math.ceil(settings.DB_READ_YOUR_WRITES_SECONDS),
+        httponly=True,
+        samesite="none",
+        secure=True,
+    )
 
 
 @app.get("/favorites/{telegram_id}")
-async def get_favorites(telegram_id: int, session: AsyncSession = Depends(get_session)):
+async def get_favorites(request: Request, telegram_id: int, session: AsyncSession = Depends(get_user_read_session)):
     result = await session.execute(
-        select(Product, Seller)
-        .join(Favorite, Favorite.product_id == Product.id)
-        .join(Seller, Product.seller_id == Seller.id)
-        .where(Favorite.user_id == telegram_id)
+        select(Favorite.product_id).where(Favorite.user_id == telegram_id)
     )
+    product_ids = result.scalars().all()
+    products = await catalog_cache.get_products(session, product_ids)
 
-    favorites = []
-    for product, seller in result.all():
-        favorites.append({
-            "id": product.id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "image_url": product.image_url,
-            "seller_name": seller.company_name
-        })
+    favorites = [products[product_id] for product_id in product_ids if product_id in products]
 
-    return {"favorites": favorites}
+    return revalidated_json(request, {"favorites": favorites})
 
 
 @app.get("/cart/{telegram_id}")
-async def get_cart(telegram_id: int, session: AsyncSession = Depends(get_session)):
+async def get_cart(request: Request, telegram_id: int, session: AsyncSession = Depends(get_user_read_session)):
     result = await session.execute(
-        select(Product, CartItem)
-        .join(CartItem, CartItem.product_id == Product.id)
-        .where(CartItem.user_id == telegram_id)
+        select(CartItem.product_id, CartItem.quantity).where(CartItem.user_id == telegram_id)
     )
+    rows = result.all()
+    products = await catalog_cache.get_products(session, [product_id for product_id, _ in rows])
 
     cart = []
     total = 0
-    for product, cart_item in result.all():
-        item_total = product.price * cart_item.quantity
+    for product_id, quantity in rows:
+        product = products.get(product_id)
+        if product is None:
+            continue
+        item_total = product["price"] * quantity
         total += item_total
         cart.append({
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "quantity": cart_item.quantity,
+            "id": product_id,
+            "name": product["name"],
+            "price": product["price"],
+            "quantity": quantity,
             "total": item_total
         })
 
-    return {"cart": cart, "total": total}
+    return revalidated_json(request, {"cart": cart, "total": total})
+
+
+# Изменение количества за одну операцию; в /batch cart_add — дельта и может быть отрицательной
+MAX_CART_QUANTITY = 1000
+
+
+def require_int(data: dict, name: str, default=None, minimum: Optional[int] = None, maximum: Optional[int] = None) -> int:
+    value = data.get(name, default)
+    # bool — подкласс int: true не должен превращаться в 1
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer")
+    if minimum is not None and value < minimum or maximum is not None and value > maximum:
+        raise HTTPException(status_code=400, detail=f"{name} is out of range")
+    return value
 
 
 @app.post("/favorites/add")
-async def add_favorite(request: Request, session: AsyncSession = Depends(get_session)):
+async def add_favorite(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
     data = await request.json()
-    user_id = data.get("user_id")
-    product_id = data.get("product_id")
+    user_id = require_int(data, "user_id")
+    product_id = require_int(data, "product_id")
 
-    existing = await session.execute(
-        select(Favorite).where(Favorite.user_id == user_id, Favorite.product_id == product_id)
-    )
-    if existing.scalar_one_or_none():
-        return {"status": "already_exists"}
-
-    favorite = Favorite(user_id=user_id, product_id=product_id)
-    session.add(favorite)
+    inserted = await upsert_favorite(session, user_id, product_id)
     await session.commit()
+    remember_write(response, user_id)
 
+    if not inserted:
+        return {"status": "already_exists"}
     return {"status": "success"}
 
 
 @app.post("/favorites/remove")
-async def remove_favorite(request: Request, session: AsyncSession = Depends(get_session)):
+async def remove_favorite(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
     data = await request.json()
-    user_id = data.get("user_id")
-    product_id = data.get("product_id")
+    user_id = require_int(data, "user_id")
+    product_id = require_int(data, "product_id")
 
-    result = await session.execute(
-        select(Favorite).where(Favorite.user_id == user_id, Favorite.product_id == product_id)
-    )
-    favorite = result.scalar_one_or_none()
-
-    if favorite:
-        await session.delete(favorite)
-        await session.commit()
+    await delete_favorite(session, user_id, product_id)
+    await session.commit()
+    remember_write(response, user_id)
 
     return {"status": "success"}
 
 
 @app.post("/cart/add")
-async def add_to_cart(request: Request, session: AsyncSession = Depends(get_session)):
+async def add_to_cart(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
     data = await request.json()
-    user_id = data.get("user_id")
-    product_id = data.get("product_id")
-    quantity = data.get("quantity", 1)
-
-    result = await session.execute(
-        select(CartItem).where(CartItem.user_id == user_id, CartItem.product_id == product_id)
-    )
-    cart_item = result.scalar_one_or_none()
-
-    if cart_item:
-        cart_item.quantity += quantity
-    else:
-        cart_item = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
-        session.add(cart_item)
+    user_id = require_int(data, "user_id")
+    product_id = require_int(data, "product_id")
+    quantity = require_int(data, "quantity", 1, minimum=1, maximum=MAX_CART_QUANTITY)
 
+    await upsert_cart_item(session, user_id, product_id, quantity)
     await session.commit()
+    remember_write(response, user_id)
     return {"status": "success"}
 
 
 @app.post("/cart/remove")
-async def remove_from_cart(request: Request, session: AsyncSession = Depends(get_session)):
+async def remove_from_cart(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
     data = await request.json()
-    user_id = data.get("user_id")
-    product_id = data.get("product_id")
+    user_id = require_int(data, "user_id")
+    product_id = require_int(data, "product_id")
 
-    result = await session.execute(
-        select(CartItem).where(CartItem.user_id == user_id, CartItem.product_id == product_id)
-    )
-    cart_item = result.scalar_one_or_none()
-
-    if cart_item:
-        await session.delete(cart_item)
-        await session.commit()
+    await delete_cart_item(session, user_id, product_id)
+    await session.commit()
+    remember_write(response, user_id)
 
     return {"status": "success"}
 
 
 @app.post("/cart/clear")
-async def clear_cart(request: Request, session: AsyncSession = Depends(get_session)):
+async def clear_cart(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
+    data = await request.json()
+    user_id = require_int(data, "user_id")
+
+    await delete_cart(session, user_id)
+    await session.commit()
+    remember_write(response, user_id)
+    return {"status": "success"}
+
+
+@app.post("/checkout")
+async def checkout(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
     data = await request.json()
     user_id = data.get("user_id")
+    idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
 
-    result = await session.execute(
-        select(CartItem).where(CartItem.user_id == user_id)
-    )
-    cart_items = result.scalars().all()
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="user_id is required")
+
+    # SQLite допускает одного писателя: оформления внутри процесса идут по очереди
+    async with serialized_writes(session):
+        try:
+            result = await checkout_cart(session, user_id, idempotency_key)
+        except CheckoutError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        await session.commit()
+    remember_write(response, user_id)
+
+    return {
+        "status": "success" if result.created else "duplicate",
+        "order_id": result.order_id,
+        "total": result.total_amount,
+    }
 
-    for item in cart_items:
-        await session.delete(item)
+
+MAX_BATCH_OPERATIONS = 100
+BATCH_OPERATIONS = ("cart_add", "cart_remove", "cart_clear", "favorite_add", "favorite_remove")
+
+
+@app.post("/batch")
+async def apply_batch(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
+    # Пачка изменений корзины и избранного применяется одной транзакцией
+    data = await request.json()
+    user_id = require_int(data, "user_id")
+    operations = data.get("operations") or []
+
+    if not isinstance(operations, list):
+        raise HTTPException(status_code=400, detail="operations must be a list")
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400, detail="Too many operations")
+
+    results = []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise HTTPException(status_code=400, detail="Each operation must be an object")
+        op = operation.get("op")
+        if op not in BATCH_OPERATIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown operation: {op}")
+        product_id = None if op == "cart_clear" else require_int(operation, "product_id")
+
+        if op == "cart_add":
+            quantity = require_int(operation, "quantity", 1, minimum=-MAX_CART_QUANTITY, maximum=MAX_CART_QUANTITY)
+            await upsert_cart_item(session, user_id, product_id, quantity)
+            results.append("success")
+        elif op == "cart_remove":
+            await delete_cart_item(session, user_id, product_id)
+            results.append("success")
+        elif op == "cart_clear":
+            await delete_cart(session, user_id)
+            results.append("success")
+        elif op == "favorite_add":
+            inserted = await upsert_favorite(session, user_id, product_id)
+            results.append("success" if inserted else "already_exists")
+        elif op == "favorite_remove":
+            await delete_favorite(session, user_id, product_id)
+            results.append("success")
 
     await session.commit()
-    return {"status": "success"}
\ No newline at end of file
+    remember_write(response, user_id)
+    return {"status": "success", "results": results}
\ No newline at end of file
@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, Optional
+import brotli
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Scope
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    if "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Сравнение слабое: W/"x" и "x" считаются одинаковыми
+    bare_etag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare_etag:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+
+
+class EncodedBody:
+    def __init__(self, body: bytes, media_type: str, brotli_quality: int = 5, gzip_level: int = 6):
+        self.media_type = media_type
+        self.variants: Dict[Optional[str], bytes] = {
+            None: body,
+            "gzip": gzip.compress(body, compresslevel=gzip_level, mtime=0),
+            "br": brotli.compress(body, quality=brotli_quality),
+        }
+
+    def response(self, request: Request, etag: str, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response:
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag, cache_control)
+
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+class StaticAsset:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            content = f.read()
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type == "application/javascript":
+            media_type += "; charset=utf-8"
+        self.hash = hashlib.sha256(content).hexdigest()[:12]
+        self.etag = f'"{self.hash}"'
+        self.body = EncodedBody(content, media_type, brotli_quality=11, gzip_level=9)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    # Сжимает все файлы каталога один раз при старте и отдаёт их из памяти
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.assets: Dict[str, StaticAsset] = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                relative_path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                self.assets[relative_path] = StaticAsset(full_path)
+
+    def url(self, path: str) -> str:
+        asset = self.assets.get(path)
+        if asset is None:
+            return f"/static/{path}"
+        return f"/static/{path}?v={asset.hash}"
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        asset = self.assets.get(path.replace(os.sep, "/"))
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        request = Request(scope)
+        # Долгий кеш только для ссылок с актуальным хешем содержимого
+        if request.query_params.get("v") == asset.hash:
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = REVALIDATE_CACHE_CONTROL
+        return asset.body.response(request, asset.etag, cache_control)
@@ -0,0 +1,327 @@
+import asyncio
+import hashlib
+import io
+import ipaddress
+import multiprocessing
+import os
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+from bot.config import settings
+from database import LRUCache
+
+THUMBNAIL_SIZES = (160, 320, 640)
+# формат -> (имя для Pillow, MIME-тип)
+THUMBNAIL_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+THUMBNAIL_QUALITY = 80
+# Увеличивается при смене алгоритма уменьшения: старые файлы кеша просто перестают находиться
+THUMBNAIL_REVISION = 1
+# Защита от «бомб»: картинка 8000×5000 ещё пройдёт. Сам Pillow выше предела только предупреждает
+# (ошибка — с двукратного), поэтому render_thumbnail превращает предупреждение в ошибку
+MAX_IMAGE_PIXELS = 40_000_000
+
+
+# Редиректы проверяются вручную: каждый адрес должен пройти check_public_url
+MAX_REDIRECTS = 3
+
+
+class ImageSourceError(Exception):
+    pass
+
+
+async def check_public_url(url: str) -> None:
+    # image_url задаёт продавец: сервер не должен ходить по нему во внутреннюю сеть и к метаданным облака.
+    # Имя проверяется перед запросом; от подмены DNS между проверкой и соединением это не защищает
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ImageSourceError("Only http(s) image URLs are allowed")
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(parts.hostname, parts.port, proto=6)
+    except OSError as e:
+        raise ImageSourceError(f"Cannot resolve image host: {e}")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ImageSourceError("Image host resolves to a non-public address")
+
+
+def render_thumbnail(source: bytes, size: int, image_format: str, path: str) -> bytes:
+    # Выполняется в пуле процессов: декодирование и сжатие не занимают event loop и GIL веб-процесса.
+    # Pillow импортируется только здесь — веб-процессу он не нужен
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    pillow_format = THUMBNAIL_FORMATS[image_format][0]
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(source)) as image:
+                # JPEG декодируется сразу в уменьшенном масштабе — в разы быстрее и меньше памяти
+                image.draft("RGB", (size, size))
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((size, size), Image.LANCZOS)
+                has_alpha = image.mode in ("RGBA", "LA") or image.mode == "P" and "transparency" in image.info
+                if image_format == "webp" and has_alpha:
+                    image = image.convert("RGBA")
+                elif has_alpha:
+                    # В JPEG нет прозрачности: подкладываем белый фон, а не чёрный
+                    background = Image.new("RGB", image.size, (255, 255, 255))
+                    background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+                    image = background
+                elif image.mode != "RGB":
+                    image = image.convert("RGB")
+
+                buffer = io.BytesIO()
+                if image_format == "webp":
+                    image.save(buffer, pillow_format, quality=THUMBNAIL_QUALITY, method=4)
+                else:
+                    image.save(buffer, pillow_format, quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    except (OSError, ValueError, Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        raise ImageSourceError(f"Cannot decode image: {e}")
+
+    data = buffer.getvalue()
+    # Запись через временный файл: другой процесс не прочитает недописанную миниатюру
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(temporary_path, "wb") as f:
+        f.write(data)
+    os.replace(temporary_path, path)
+    return data
+
+
+def thumbnail_name(source_hash: str, size: int, image_format: str) -> str:
+    return f"{source_hash}-{size}-r{THUMBNAIL_REVISION}.{image_format}"
+
+
+class ThumbnailCache:
+    # Файлы адресуются хешем содержимого исходника: одна и та же картинка у разных товаров
+    # хранится один раз. Порядок вытеснения — в памяти; после перезапуска берётся по mtime
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.loaded = False
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    def load(self) -> None:
+        self.loaded = True
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    # Остатки оборванной записи
+                    os.remove(full_path)
+                    continue
+                stat = os.stat(full_path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.total_bytes += size
+        self._evict()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._files
+
+    def get(self, name: str) -> Optional[str]:
+        if name not in self._files:
+            self.misses += 1
+            return None
+        self._files.move_to_end(name)
+        self.hits += 1
+        return self.path(name)
+
+    def add(self, name: str, size: int) -> None:
+        previous = self._files.pop(name, None)
+        if previous is not None:
+            self.total_bytes -= previous
+        self._files[name] = size
+        self.total_bytes += size
+        self._evict()
+
+    def discard(self, name: str) -> None:
+        size = self._files.pop(name, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and len(self._files) > 1:
+            name, size = self._files.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": len(self._files),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class ImageProxy:
+    def __init__(
+        self,
+        cache_dir: str,
+        max_cache_bytes: int,
+        workers: int,
+        source_dir: Optional[str] = None,
+        fetch_timeout: float = 10,
+        max_source_bytes: int = 10 * 1024 * 1024,
+    ):
+        self.cache = ThumbnailCache(cache_dir, max_cache_bytes)
+        self.workers = workers
+        self.source_dir = os.path.realpath(source_dir) if source_dir else None
+        self.fetch_timeout = fetch_timeout
+        self.max_source_bytes = max_source_bytes
+        # image_url -> sha256 исходника, чтобы при попадании в кеш не скачивать исходник снова
+        self._sources = LRUCache(maxsize=100000)
+        # Одновременные запросы одной миниатюры ждут одну и ту же задачу
+        self._pending: Dict[Tuple[str, int, str], asyncio.Task] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._start_lock = asyncio.Lock()
+        self.fetched = 0
+        self.rendered = 0
+
+    async def _ensure_started(self) -> None:
+        if self._pool is not None:
+            return
+        async with self._start_lock:
+            if self._pool is not None:
+                return
+            if not self.cache.loaded:
+                await asyncio.to_thread(self.cache.load)
+            self._client = httpx.AsyncClient(timeout=self.fetch_timeout, follow_redirects=False)
+            # spawn, как в run.py: fork из процесса с event loop и потоками может унаследовать захваченные блокировки
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def fetch_source(self, image_url: str) -> bytes:
+        self.fetched += 1
+        if image_url.startswith(("http://", "https://")):
+            url = image_url
+            try:
+                for _ in range(MAX_REDIRECTS + 1):
+                    await check_public_url(url)
+                    async with self._client.stream("GET", url) as response:
+                        if response.is_redirect:
+                            url = str(response.url.join(response.headers["location"]))
+                            continue
+                        if response.status_code != 200:
+                            raise ImageSourceError(f"Source returned {response.status_code}")
+                        chunks = []
+                        received = 0
+                        async for chunk in response.aiter_bytes():
+                            received += len(chunk)
+                            if received > self.max_source_bytes:
+                                raise ImageSourceError("Source image is too large")
+                            chunks.append(chunk)
+                        return b"".join(chunks)
+            except (httpx.HTTPError, KeyError) as e:
+                raise ImageSourceError(f"Cannot fetch source: {e}")
+            raise ImageSourceError("Too many redirects")
+
+        if self.source_dir is None:
+            raise ImageSourceError("Local image sources are disabled")
+        relative_path = image_url.removeprefix("file://").lstrip("/")
+        path = os.path.realpath(os.path.join(self.source_dir, relative_path))
+        # Путь вида ../../etc/passwd не должен выйти за пределы каталога исходников
+        if not path.startswith(self.source_dir + os.sep):
+            raise ImageSourceError("Invalid local image path")
+        data = await asyncio.to_thread(read_file, path)
+        if data is None:
+            raise ImageSourceError("Local image not found")
+        if len(data) > self.max_source_bytes:
+            raise ImageSourceError("Source image is too large")
+        return data
+
+    async def thumbnail(self, image_url: str, size: int, image_format: str) -> Tuple[str, bytes]:
+        await self._ensure_started()
+        source_hash = self._sources.get(image_url)
+        if source_hash is not None:
+            name = thumbnail_name(source_hash, size, image_format)
+            path = self.cache.get(name)
+            if path is not None:
+                data = await asyncio.to_thread(read_file, path)
+                if data is not None:
+                    return name, data
+                # Файл удалил другой процесс при вытеснении
+                self.cache.discard(name)
+
+        key = (image_url, size, image_format)
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(image_url, size, image_format))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # shield: отмена одного запроса не прерывает генерацию для остальных
+        return await asyncio.shield(task)
+
+    async def _render(self, image_url: str, size: int, image_format: str) -> Tuple[str, bytes]:
+        source = await self.fetch_source(image_url)
+        source_hash = hashlib.sha256(source).hexdigest()
+        self._sources.set(image_url, source_hash)
+        name = thumbnail_name(source_hash, size, image_format)
+
+        # Та же картинка уже уменьшена для другого товара
+        if name in self.cache:
+            data = await asyncio.to_thread(read_file, self.cache.path(name))
+            if data is not None:
+                return name, data
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self._pool, render_thumbnail, source, size, image_format, self.cache.path(name))
+        self.rendered += 1
+        self.cache.add(name, len(data))
+        return name, data
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "fetched": self.fetched,
+            "rendered": self.rendered,
+            "pending": len(self._pending),
+        }
+
+
+image_proxy = ImageProxy(
+    cache_dir=settings.IMAGE_CACHE_DIR,
+    max_cache_bytes=settings.IMAGE_CACHE_MAX_MB * 1024 * 1024,
+    workers=settings.IMAGE_WORKERS,
+    source_dir=settings.IMAGE_SOURCE_DIR,
+    fetch_timeout=settings.IMAGE_FETCH_TIMEOUT,
+    max_source_bytes=settings.IMAGE_MAX_SOURCE_MB * 1024 * 1024,
+)
@@ -0,0 +1,58 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from database.metrics import QUERY_COUNT_BUCKETS, registry, track_queries
+
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_ERRORS = registry.counter("http_request_errors_total", "HTTP requests that raised or returned 5xx", ("method", "route"))
+HTTP_IN_PROGRESS = registry.gauge("http_requests_in_progress", "HTTP requests being processed", ("method",))
+HTTP_SECONDS = registry.histogram("http_request_duration_seconds", "HTTP request latency including streamed body", ("method", "route"))
+HTTP_DB_QUERIES = registry.histogram("http_request_db_queries", "SQL statements per HTTP request", ("method", "route"), QUERY_COUNT_BUCKETS)
+HTTP_DB_SECONDS = registry.histogram("http_request_db_seconds", "Time in SQL per HTTP request", ("method", "route"))
+
+
+def route_label(scope: Scope) -> str:
+    # Шаблон пути, а не сам путь: /cart/{telegram_id} — одна серия на маршрут
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Смонтированные приложения (статика) и неизвестные пути
+    return scope.get("root_path") or "unmatched"
+
+
+class MetricsMiddleware:
+    # Чистый ASGI: без BaseHTTPMiddleware и лишней задачи на каждый запрос
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc(method)
+        started_at = time.perf_counter()
+        try:
+            with track_queries() as queries:
+                await self.app(scope, receive, send_with_status)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            elapsed = time.perf_counter() - started_at
+            HTTP_IN_PROGRESS.dec(method)
+            route = route_label(scope)
+            HTTP_REQUESTS.inc(method, route, str(status))
+            HTTP_SECONDS.observe(elapsed, method, route)
+            HTTP_DB_QUERIES.observe(queries.queries, method, route)
+            HTTP_DB_SECONDS.observe(queries.seconds, method, route)
+            if status >= 500:
+                HTTP_ERRORS.inc(method, route)